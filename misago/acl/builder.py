@@ -0,0 +1,90 @@
+"""
+Compiled ACLs shared between all users with same set of roles
+"""
+import hashlib
+from django.core.cache import cache
+from misago.acl.models import Role
+
+_acl_cache = {}
+_acl_cache_version = None
+_guest_roles = ()
+_guest_roles_version = None
+
+
+class ACL(object):
+    """
+    Compiled Access Control List
+    """
+    def __init__(self, version, roles):
+        self.version = version
+        self.roles = []
+        self.tokens = []
+        for role in roles:
+            self.roles.append(role.pk)
+            if role.token:
+                self.tokens.append(role.token)
+
+    def has_role(self, token):
+        return token in self.tokens
+
+
+def get_roles_key(version, roles):
+    """
+    Build ACL key from ACL version and sorted list of roles ID's
+    """
+    roles = ','.join([str(role) for role in sorted(roles)])
+    return hashlib.md5('%s:%s' % (version, roles)).hexdigest()
+
+
+def get_user_roles(user, version):
+    """
+    Return ID's of user roles, guests and crawlers share "guest" role
+    """
+    global _guest_roles, _guest_roles_version
+    if user.is_authenticated():
+        return [role for role in user.roles.values_list('id', flat=True)]
+    if _guest_roles_version != version:
+        _guest_roles = tuple(Role.objects.filter(token='guest').values_list('id', flat=True))
+        _guest_roles_version = version
+    return _guest_roles
+
+
+def build_acl(version, roles):
+    """
+    Compile new ACL for set of roles
+    """
+    return ACL(version, Role.objects.filter(pk__in=roles).order_by('pk'))
+
+
+def get_acl(request, user):
+    """
+    Get ACL for user, compiling it only when no other user with same roles did it before
+    """
+    global _acl_cache_version
+    # Monitor returns values read from database as strings
+    version = int(request.monitor.get('acl_version', 0))
+    if _acl_cache_version != version:
+        # ACL's have changed, forget all compiled ones
+        _acl_cache.clear()
+        _acl_cache_version = version
+
+    roles = get_user_roles(user, version)
+    roles_key = get_roles_key(version, roles)
+    try:
+        return _acl_cache[roles_key]
+    except KeyError:
+        pass
+
+    acl = cache.get('misago.acl.%s' % roles_key)
+    if not acl:
+        acl = build_acl(version, roles)
+        cache.set('misago.acl.%s' % roles_key, acl)
+    _acl_cache[roles_key] = acl
+    return acl
+
+
+def update_acl_version(monitor):
+    """
+    Invalidate all compiled ACL's
+    """
+    monitor['acl_version'] = int(monitor.get('acl_version', 0)) + 1
\ No newline at end of file
@@ -1,8 +1,16 @@
 from misago.acl.models import Role
+from misago.monitor.fixtures import load_monitor_fixture
 from misago.utils import ugettext_lazy as _
 from misago.utils import get_msgid
 
+monitor_fixtures = {
+                  'acl_version': 0,
+                  }
+
+
 def load_fixtures():
+    load_monitor_fixture(monitor_fixtures)
+    
     role_admin = Role(
                       name=_("Administrator").message,
                       token='admin',
@@ -1,3 +1,5 @@
+from misago.acl.builder import get_acl
+
 class ACLMiddleware(object):
     def process_request(self, request):
-        print 'ACL MIDDLEWARE!!!'
\ No newline at end of file
+        request.acl = get_acl(request, request.user)
\ No newline at end of file
@@ -13,4 +13,17 @@ class Role(models.Model):
         return unicode(_(self.name))
     
     def is_special(self):
-        return token
\ No newline at end of file
+        return token
+    
+    def save(self, *args, **kwargs):
+        super(Role, self).save(*args, **kwargs)
+        self.update_acl_version()
+        
+    def delete(self, *args, **kwargs):
+        super(Role, self).delete(*args, **kwargs)
+        self.update_acl_version()
+        
+    def update_acl_version(self):
+        from misago.acl.builder import update_acl_version
+        from misago.monitor.monitor import Monitor
+        update_acl_version(Monitor())
\ No newline at end of file
@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.conf.urls import patterns, include, url
+from django.core.exceptions import ImproperlyConfigured
 from django.core.urlresolvers import resolve
 from django.utils.importlib import import_module
 
@@ -25,33 +26,33 @@ class SortList(object):
         
     def sort(self):
         # Sort and return sorted list
-        order = []
-        cache = {}
+        # Every item is placed right after item it wants to be after
+        roots = []
+        children = {}
+        items_ids = set([item.id for item in self.unsorted])
         for item in self.unsorted:
             if item.after:
+                if item.after not in items_ids:
+                    raise ImproperlyConfigured('Admin item "%s" is set to be after "%s" that does not exist.' % (item.id, item.after))
                 try:
-                    cache[item.after].append(item.id)
+                    children[item.after].append(item)
                 except KeyError:
-                    cache[item.after] = []
-                    cache[item.after].append(item.id)
+                    children[item.after] = [item]
             else:
-                order.append(item.id)
-        while cache:
-            for item in cache.keys():
-                try:
-                    target_index = order.index(item)
-                    for new_item in cache[item]:
-                        target_index += 1
-                        order.insert(target_index, new_item)
-                    del cache[item]
-                except ValueError:
-                    pass
+                roots.append(item)
+        
+        # Walk items tree depth-first
         sorted = []
-        for item in order:
-            for object in self.unsorted:
-                if item == object.id:
-                    sorted.append(object)
-                    break
+        stack = list(reversed(roots))
+        while stack:
+            item = stack.pop()
+            sorted.append(item)
+            stack += reversed(children.get(item.id, []))
+            
+        # Items not reachable from roots are after each other in loop
+        if len(sorted) < len(self.unsorted):
+            sorted_ids = set([item.id for item in sorted])
+            raise ImproperlyConfigured('Admin items "%s" are set to be after each other.' % '", "'.join([item.id for item in self.unsorted if item.id not in sorted_ids]))
         return sorted
         
             
@@ -103,6 +104,7 @@ Admin site section
 class AdminSection(AdminSiteItem):
     def __init__(self, section=None, **kwargs):
         self.actions = []
+        self.actions_index = {}
         self.last = None
         super(AdminSection, self).__init__(**kwargs)
         
@@ -131,6 +133,7 @@ class AdminSite(object):
     routes = []
     sections = []
     sections_index = {}
+    navigation = {}
     
     def discover(self):
         """
@@ -187,8 +190,9 @@ class AdminSite(object):
         # Put actions in sections
         for action in actions:
             self.sections_index[action.section].actions.append(action)
+            self.sections_index[action.section].actions_index[action.id] = action
         
-        # Return ready admin routing
+        # Build ready admin routing
         first_section = True
         for section in self.sections:
             if first_section:
@@ -196,8 +200,36 @@ class AdminSite(object):
                 first_section = False
             else:
                 self.routes += patterns('', url(('^%s/' % section.id), include(section.get_routes())))
+        
+        # Compile navigation for every action and return routing
+        self.build_navigation()
         return self.routes
     
+    def build_navigation(self):
+        """
+        Precompute admin navigation for every section and action
+        """
+        admin_index = self.get_admin_index()
+        for active_section in self.sections:
+            sections = tuple([{
+                               'is_active': section == active_section,
+                               'name': section.name,
+                               'icon': section.icon,
+                               'route': section.actions[0].route
+                               } for section in self.sections])
+            for active_action in active_section.actions:
+                self.navigation[(active_section.id, active_action.id)] = {
+                    'sections': sections,
+                    'actions': tuple([{
+                                       'is_active': action == active_action,
+                                       'name': action.name,
+                                       'icon': action.icon,
+                                       'help': action.help,
+                                       'route': action.route
+                                       } for action in active_section.actions]),
+                    'admin_index': admin_index,
+                    }
+    
     def get_action(self, action):
         """
         Get admin action
@@ -210,56 +242,31 @@ class AdminSite(object):
         """
         return self.sections[0].actions[0].route
             
-    def get_admin_navigation(self, request):
+    def resolve_path(self, path):
         """
-        Find and return current admin navigation
+        Find section and action path belongs to
         """
-        sections = []
-        actions = []
-        active_section = False
-        active_action = False
+        path = path[len(ADMIN_PATH) + 1:].split('/')
         
-        # Loop sections, build list of sections and find active section
-        for section in self.sections:
-            is_active = section.is_active(request.path)
-            sections.append({
-                             'is_active': is_active,
-                             'name': section.name,
-                             'icon': section.icon,
-                             'route': section.actions[0].route
-                             })
-            if is_active:
-                active_section = section
-        
-        # If no section was found to be active, default to first one
-        if not active_section:
+        # First section is routed without its id in path
+        if path[0] in self.sections_index and self.sections_index[path[0]] != self.sections[0]:
+            active_section = self.sections_index[path[0]]
+            path = path[1:]
+        else:
             active_section = self.sections[0]
-            sections[0]['is_active'] = True
             
-        # Loop active section actions
-        for action in active_section.actions:
-            is_active = action.is_active(request.path, active_section.id if active_section != self.sections[0] else None)
-            actions.append({
-                             'is_active': is_active,
-                             'name': action.name,
-                             'icon': action.icon,
-                             'help': action.help,
-                             'route': action.route
-                             })
-            if is_active:
-                active_action = action
-        
         # If no action was found to be active, default to first one
+        active_action = active_section.actions_index.get(path[0] if path else None)
         if not active_action:
             active_action = active_section.actions[0]
-            actions[0]['is_active'] = True
-        
-        # Return admin navigation for this location
-        return {
-                'sections': sections,
-                'actions': actions,
-                'admin_index': self.get_admin_index(),
-                }
+        return active_section, active_action
+    
+    def get_admin_navigation(self, request):
+        """
+        Find and return current admin navigation
+        """
+        active_section, active_action = self.resolve_path(request.path)
+        return self.navigation[(active_section.id, active_action.id)]
 
 
 site = AdminSite();
\ No newline at end of file
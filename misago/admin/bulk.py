@@ -0,0 +1,130 @@
+import base64
+import cPickle as pickle
+import threading
+from datetime import timedelta
+from django.db import connection, models
+from django.db.models import Q
+from django.utils import timezone
+from django.utils.importlib import import_module
+from misago.admin.models import BulkJob
+from misago.security import get_random_string
+
+"""
+Bulk actions applied to all items matching admin list filters
+
+Items are processed in chunks ordered by primary key. Job is kept in database together with
+primary key of last processed item, so job stopped with process that was running it
+can be resumed by resumebulkactions command. Action and finish have to be module level
+functions, and action has to cope with chunk being applied again after job was stopped
+in its middle.
+"""
+LOCK_TIME = timedelta(minutes=10)
+
+
+def get_progress(job):
+    try:
+        return BulkJob.objects.get(pk=job)
+    except BulkJob.DoesNotExist:
+        return None
+
+
+def get_function_path(function):
+    path = '%s.%s' % (function.__module__, function.__name__)
+    if resolve_function(path) is not function:
+        raise ValueError("Bulk action function \"%s\" has to be defined on module level." % path)
+    return path
+
+
+def resolve_function(path):
+    module, function = path.rsplit('.', 1)
+    return getattr(import_module(module), function, None)
+
+
+def get_job_queryset(job):
+    app_label, model_name = job.model.split('.')
+    queryset = models.get_model(app_label, model_name).objects.all()
+    queryset.query = pickle.loads(base64.b64decode(job.query))
+    return queryset
+
+
+def lock_job(job):
+    """
+    Take job for this process, unless other process is running it
+    """
+    now = timezone.now()
+    return BulkJob.objects.filter(pk=job.pk, finished=False).filter(
+                                  Q(locked__isnull=True) | Q(locked__lt=now - LOCK_TIME)
+                                  ).update(locked=now) == 1
+
+
+def run_job(job):
+    """
+    Apply job action to items chunk after chunk, starting after last processed one
+    """
+    try:
+        queryset = get_job_queryset(job)
+        action = resolve_function(job.action)
+        while True:
+            chunk = [item for item in queryset.filter(pk__gt=job.last_pk).order_by('pk')[:job.chunk_size]]
+            if not chunk:
+                break
+            action(chunk)
+            job.last_pk = chunk[-1].pk
+            job.done += len(chunk)
+            BulkJob.objects.filter(pk=job.pk).update(last_pk=job.last_pk, done=job.done, locked=timezone.now())
+        if job.finish:
+            resolve_function(job.finish)()
+    except Exception as e:
+        # Jobs stopped by errors are not resumed
+        job.error = unicode(e)
+    job.finished = True
+    BulkJob.objects.filter(pk=job.pk).update(finished=True, error=job.error, locked=None)
+
+
+def resume_jobs():
+    """
+    Resume jobs that were stopped together with processes running them, returning their number
+    """
+    BulkJob.objects.filter(finished=True, started__lt=timezone.now() - timedelta(days=1)).delete()
+    resumed = 0
+    for job in BulkJob.objects.filter(finished=False).order_by('started'):
+        if lock_job(job):
+            run_job(job)
+            resumed += 1
+    return resumed
+
+
+class BulkActionWorker(threading.Thread):
+    """
+    Thread running job started by admin
+    """
+    def __init__(self, job):
+        self.job = job
+        super(BulkActionWorker, self).__init__()
+        self.daemon = True
+
+    def run(self):
+        try:
+            if lock_job(self.job):
+                run_job(self.job)
+        finally:
+            connection.close()
+
+
+def start_bulk_action(name, queryset, action, finish=None, chunk_size=200):
+    """
+    Start new bulk action job and return its id
+    """
+    job = BulkJob.objects.create(
+                                 id=get_random_string(16),
+                                 name=name,
+                                 model='%s.%s' % (queryset.model._meta.app_label, queryset.model._meta.object_name),
+                                 query=base64.b64encode(pickle.dumps(queryset.query, pickle.HIGHEST_PROTOCOL)),
+                                 action=get_function_path(action),
+                                 finish=get_function_path(finish) if finish else None,
+                                 chunk_size=chunk_size,
+                                 total=queryset.count(),
+                                 started=timezone.now(),
+                                 )
+    BulkActionWorker(job).start()
+    return job.pk
@@ -0,0 +1,110 @@
+import hashlib
+import re
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection, DatabaseError
+from django.db.models.signals import post_save, post_delete, m2m_changed
+from misago.utils.versions import get_version, bump_version
+
+"""
+Admin lists items counter
+
+Counts are cached under keys built from model, normalized filter criteria and model data version.
+Model data version changes whenever model's row is saved or deleted, invalidating all its counts.
+Models listed in admin should be registered from their models modules, so their changes
+invalidate counts in every process.
+"""
+_registered_models = set()
+
+
+def get_model_label(model):
+    return '%s.%s' % (model._meta.app_label, model._meta.object_name.lower())
+
+
+def get_data_version(model):
+    return get_version('misago.admin.counts.%s' % get_model_label(model))
+
+
+def invalidate(model):
+    """
+    Change model data version, making all its cached counts stale.
+    Call it after bulk updates that dont send model signals.
+    """
+    bump_version('misago.admin.counts.%s' % get_model_label(model))
+
+
+def _invalidate_sender(sender, **kwargs):
+    invalidate(sender)
+
+
+def _invalidate_m2m(sender, **kwargs):
+    if kwargs.get('action', '').startswith('post_'):
+        invalidate(kwargs['instance'].__class__)
+
+
+def register(model):
+    """
+    Connect model signals to counts invalidation
+    Call it from module defining model, so signals are connected in every process
+    """
+    if model in _registered_models:
+        return
+    _registered_models.add(model)
+    post_save.connect(_invalidate_sender, sender=model, dispatch_uid='misago.admin.counts.save.%s' % get_model_label(model))
+    post_delete.connect(_invalidate_sender, sender=model, dispatch_uid='misago.admin.counts.delete.%s' % get_model_label(model))
+    for field in model._meta.many_to_many:
+        m2m_changed.connect(_invalidate_m2m, sender=field.rel.through, dispatch_uid='misago.admin.counts.m2m.%s.%s' % (get_model_label(model), field.name))
+
+
+def normalize_filters(filters):
+    """
+    Turn filters dict into string that is same for same criteria
+    """
+    if not filters:
+        return ''
+    normalized = []
+    for key in sorted(filters.keys()):
+        value = filters[key]
+        if hasattr(value, '__iter__'):
+            value = sorted([unicode(getattr(item, 'pk', item)) for item in value])
+        else:
+            value = unicode(value)
+        normalized.append('%s=%s' % (key, value))
+    return hashlib.md5(u'&'.join(normalized).encode('utf-8')).hexdigest()
+
+
+def estimate_count(queryset):
+    """
+    Return number of rows query planner expects queryset to return, or None if no estimate is available
+    """
+    if not settings.DATABASES['default']['ENGINE'] in ('django.db.backends.postgresql_psycopg2', 'django.db.backends.postgresql'):
+        return None
+    try:
+        sql, params = queryset.query.sql_with_params()
+        cursor = connection.cursor()
+        cursor.execute('EXPLAIN %s' % sql, params)
+        plan = cursor.fetchone()[0]
+    except DatabaseError:
+        return None
+    estimate = re.search(r'rows=(\d+)', plan)
+    if not estimate:
+        return None
+    return int(estimate.group(1))
+
+
+def count_items(model, queryset, filters=None):
+    """
+    Count items in queryset, returning tuple with count and flag telling if its estimate
+    """
+    threshold = settings.ADMIN_COUNT_ESTIMATE_THRESHOLD
+    if threshold:
+        estimate = estimate_count(queryset)
+        if estimate is not None and estimate >= threshold:
+            return estimate, True
+
+    cache_key = 'misago.admin.counts.%s.%s.%s' % (get_model_label(model), get_data_version(model), normalize_filters(filters))
+    items_total = cache.get(cache_key)
+    if items_total is None:
+        items_total = queryset.count()
+        cache.set(cache_key, items_total, settings.ADMIN_COUNT_CACHE_TIME)
+    return items_total, False
\ No newline at end of file
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from misago.admin.bulk import resume_jobs
+
+class Command(BaseCommand):
+    """
+    This command resumes admin bulk actions that were stopped together with processes running them. Run it from CRON.
+    """
+    help = 'Resumes stopped bulk actions'
+    def handle(self, *args, **options):
+        resumed = resume_jobs()
+        self.stdout.write('%s bulk actions have been resumed.\n' % resumed)
\ No newline at end of file
@@ -0,0 +1,20 @@
+from django.db import models
+
+class BulkJob(models.Model):
+    """
+    Bulk action applied to all items matching admin list filters
+    """
+    id = models.CharField(max_length=16, primary_key=True)
+    name = models.CharField(max_length=255)
+    model = models.CharField(max_length=255)
+    query = models.TextField()
+    action = models.CharField(max_length=255)
+    finish = models.CharField(max_length=255, null=True, blank=True)
+    chunk_size = models.PositiveIntegerField(default=200)
+    total = models.PositiveIntegerField(default=0)
+    done = models.PositiveIntegerField(default=0)
+    last_pk = models.PositiveIntegerField(default=0)
+    finished = models.BooleanField(default=False)
+    error = models.TextField(null=True, blank=True)
+    started = models.DateTimeField()
+    locked = models.DateTimeField(null=True, blank=True)
\ No newline at end of file
@@ -1,10 +1,14 @@
 from django import forms
 from django.core.urlresolvers import reverse
+from django.db.models import Q
+from django.db.models.fields import FieldDoesNotExist
 from django.shortcuts import redirect
 from django.template import RequestContext
 from django.utils.translation import ugettext_lazy as _
 from jinja2 import TemplateNotFound
 import math
+from misago.admin.bulk import get_progress, start_bulk_action
+from misago.admin.counts import count_items
 from misago.forms import Form
 from misago.forms.layouts import *
 from misago.messages import Message, BasicMessage
@@ -87,6 +91,9 @@ class ListWidget(BaseWidget):
     search_form = None
     is_filtering = False
     pagination = None
+    keyset_pagination = False
+    prefetch_related = None
+    items_total_estimated = False
     template = 'list'
     hide_actions = False
     table_form_button = _('Go')
@@ -94,6 +101,8 @@ class ListWidget(BaseWidget):
     empty_search_message = _('Search has returned no items')
     nothing_checked_message = _('You have to select at least one item.')
     prompt_select = False
+    bulk_actions = []
+    bulk_chunk_size = 200
     
     def get_item_actions(self, request, item):
         """
@@ -157,6 +166,49 @@ class ListWidget(BaseWidget):
         form_fields['list_items'] = forms.MultipleChoiceField(choices=list_choices,widget=forms.CheckboxSelectMultiple)
         return type('AdminListForm', (Form,), form_fields)
         
+    def get_bulk_form(self, request):
+        """
+        Build a form object with list of actions that can be applied to all items matching search
+        """
+        if not self.bulk_actions or not self.is_filtering:
+            return None # Dont build form
+        list_choices = []
+        for action in self.bulk_actions:
+            list_choices.append((action[0], action[1]))
+        return type('AdminBulkForm', (Form,), {'bulk_action': forms.ChoiceField(choices=list_choices)})
+    
+    def get_bulk_queryset(self, request, action, items):
+        """
+        Return queryset with items bulk action will be applied to
+        """
+        return items
+    
+    def get_bulk_action(self, action):
+        """
+        Return tuple with function applying bulk action to chunk of items and function called
+        when action has been applied to all items. Both have to be module level functions.
+        """
+        return getattr(self, 'bulk_' + action), getattr(self, 'bulk_finished_' + action, None)
+    
+    def bulk_progress(self, request, job):
+        """
+        Display progress of bulk action
+        """
+        progress = get_progress(job)
+        if not progress:
+            request.messages.set_flash(BasicMessage(_("Progress of requested bulk action is unavailable. It has finished long time ago.")), 'info', self.admin.id)
+            return redirect(self.get_url())
+        return request.theme.render_to_response(self.get_templates('bulk'),
+                                                {
+                                                 'admin': self.admin,
+                                                 'action': self,
+                                                 'request': request,
+                                                 'url': self.get_url(),
+                                                 'progress': progress,
+                                                 'percent': int(progress['done'] * 100 / progress['total']) if progress['total'] else 100,
+                                                },
+                                                context_instance=RequestContext(request));
+    
     def get_sorting(self, request):
         """
         Return list sorting method.
@@ -198,7 +250,8 @@ class ListWidget(BaseWidget):
         return sorting_method
     
     def sort_items(self, request, page_items, sorting_method):
-        return page_items.order_by(sorting_method[2])
+        # Sort by primary key too, so items with same value keep their order between pages
+        return page_items.order_by(sorting_method[2], 'pk' if sorting_method[1] else '-pk')
     
     def get_pagination_url(self, page):
         return reverse(self.admin.get_action_attr(self.id, 'route'), kwargs={'page': page})
@@ -245,18 +298,119 @@ class ListWidget(BaseWidget):
         pagination['stop'] = pagination['start'] + self.pagination
         return pagination
     
+    def get_keyset_field(self, sorting_method):
+        """
+        Return name of field list can be paginated over using keyset pagination.
+        Keyset pagination requires not null field, lists sorted by other fields use offset pagination.
+        Lists with own sort_items dont tell what they are sorted by, so they use offset pagination too.
+        """
+        if not self.keyset_pagination or not self.pagination:
+            return None
+        if self.__class__.sort_items.im_func is not ListWidget.sort_items.im_func:
+            return None
+        try:
+            if self.admin.model._meta.get_field(sorting_method[0]).null:
+                return None
+        except FieldDoesNotExist:
+            return None
+        return sorting_method[0]
+    
+    def get_keyset_pagination(self, request, items, field, sorting_method, total):
+        """
+        Return list page and pagination using keyset (seek) method.
+        Instead of skipping offset of rows, items are sliced after (or before) cursor item,
+        comparing sorting field and primary key so page depth doesnt matter.
+        Returns tuple with items list and pagination dict containing:
+        - no. of prev page (or -1 for first page)
+        - no. of next page (or -1 for last page)
+        - Current page
+        - Pages total (approximate)
+        - Cursors for prev and next page links
+        """
+        pagination = {'keyset': True, 'prev': -1, 'next': -1, 'before': None, 'after': None}
+        try:
+            pagination['page'] = max(int(request.GET.get('page', 1)), 1)
+        except ValueError:
+            pagination['page'] = 1
+        pagination['total'] = max(int(math.ceil(total / float(self.pagination))), pagination['page'])
+        
+        # Find cursor item
+        cursor = None
+        backwards = False
+        try:
+            if request.GET.get('after'):
+                cursor = int(request.GET.get('after'))
+            elif request.GET.get('before'):
+                cursor = int(request.GET.get('before'))
+                backwards = True
+            if cursor:
+                cursor_value = self.admin.model.objects.filter(pk=cursor).values_list(field, flat=True)[0]
+        except (IndexError, ValueError):
+            cursor = None
+            backwards = False
+        if not cursor:
+            pagination['page'] = 1
+            
+        # Seek items after or before cursor
+        forward = sorting_method[1] != backwards
+        if cursor:
+            if forward:
+                items = items.filter(Q(**{'%s__gt' % field: cursor_value}) | Q(**{field: cursor_value, 'pk__gt': cursor}))
+            else:
+                items = items.filter(Q(**{'%s__lt' % field: cursor_value}) | Q(**{field: cursor_value, 'pk__lt': cursor}))
+        if forward:
+            items = self.sort_items(request, items, [field, True, field])
+        else:
+            items = self.sort_items(request, items, [field, False, '-%s' % field])
+        if self.prefetch_related:
+            items = self.prefetch_related(items)
+            
+        # Fetch one item more to see if there is next page
+        items = [item for item in items[:self.pagination + 1]]
+        has_more = len(items) > self.pagination
+        items = items[:self.pagination]
+        if backwards:
+            items.reverse()
+            if not has_more:
+                pagination['page'] = 1
+        
+        # Allow prev/next?
+        if items:
+            if (backwards and has_more) or (not backwards and cursor):
+                pagination['prev'] = max(pagination['page'] - 1, 1)
+                pagination['before'] = items[0].pk
+            if backwards or has_more:
+                pagination['next'] = pagination['page'] + 1
+                pagination['after'] = items[-1].pk
+        return items, pagination
+    
+    def get_items_total(self, request):
+        """
+        Count items on list.
+        Counts are cached until list's model changes, large lists may use planner estimates.
+        """
+        filters = request.session.get(self.get_token('filter'))
+        if filters:
+            items = self.set_filters(self.admin.model.objects, filters)
+        else:
+            items = self.admin.model.objects.all()
+        items_total, self.items_total_estimated = count_items(self.admin.model, items, filters)
+        return items_total
+    
     def __call__(self, request, page=0):
         """
         Use widget as view
         """
+        # Display bulk action progress?
+        if request.GET.get('bulk'):
+            return self.bulk_progress(request, request.GET.get('bulk'))
+        
         # Get basic list attributes
         if request.session.get(self.get_token('filter')):
             self.is_filtering = True
-            items_total = self.set_filters(self.admin.model.objects, request.session.get(self.get_token('filter'))).count()
-        else:
-            items_total = self.admin.model.objects.count()
         sorting_method = self.get_sorting(request)
-        paginating_method = self.get_pagination(request, items_total, page)
+        keyset_field = self.get_keyset_field(sorting_method)
+        items_total = self.get_items_total(request)
         
         # List items
         items = self.admin.model.objects
@@ -266,17 +420,24 @@ class ListWidget(BaseWidget):
             items = self.set_filters(items, request.session.get(self.get_token('filter')))
         else:
             items = items.all()
-                   
-        # Sort them
-        items = self.sort_items(request, items, sorting_method);
+        filtered_items = items
         
-        # Set pagination
-        if self.pagination:
-            items = items[paginating_method['start']:paginating_method['stop']]
-        
-        # Prefetch related?
-        if self.prefetch_related:
-            items = self.prefetch_related(items)
+        if keyset_field:
+            # Seek page using sorting field
+            items, paginating_method = self.get_keyset_pagination(request, items, keyset_field, sorting_method, items_total)
+        else:
+            paginating_method = self.get_pagination(request, items_total, page)
+            
+            # Sort them
+            items = self.sort_items(request, items, sorting_method);
+            
+            # Set pagination
+            if self.pagination:
+                items = items[paginating_method['start']:paginating_method['stop']]
+            
+            # Prefetch related?
+            if self.prefetch_related:
+                items = self.prefetch_related(items)
             
         # Default message
         message = request.messages.get_message(self.admin.id)
@@ -358,6 +519,32 @@ class ListWidget(BaseWidget):
                 message.type = 'error'
             else:
                 list_form = ListForm(request=request)
+        
+        # See if we should make and handle bulk form
+        bulk_form = None
+        BulkForm = self.get_bulk_form(request)
+        if BulkForm:
+            if request.method == 'POST' and request.POST.get('origin') == 'bulk':
+                bulk_form = BulkForm(request.POST, request=request)
+                if bulk_form.is_valid() and request.csrf.request_secure(request):
+                    bulk_action = bulk_form.cleaned_data['bulk_action']
+                    try:
+                        action, finish = self.get_bulk_action(bulk_action)
+                        job = start_bulk_action(
+                                                unicode(dict([(a[0], a[1]) for a in self.bulk_actions])[bulk_action]),
+                                                self.get_bulk_queryset(request, bulk_action, filtered_items),
+                                                action,
+                                                finish,
+                                                self.bulk_chunk_size
+                                                )
+                        return redirect(self.get_url() + '?bulk=%s' % job)
+                    except AttributeError:
+                        message = BasicMessage(_("Action requested is incorrect."))
+                else:
+                    message = BasicMessage(_("Action requested is incorrect."))
+                message.type = 'error'
+            else:
+                bulk_form = BulkForm(request=request)
                 
         # Render list
         return request.theme.render_to_response(self.get_templates(self.template),
@@ -373,6 +560,7 @@ class ListWidget(BaseWidget):
                                                  'list_form': FormLayout(list_form) if list_form else None,
                                                  'search_form': FormLayout(search_form) if search_form else None,
                                                  'table_form': FormFields(table_form).fields if table_form else None,
+                                                 'bulk_form': FormLayout(bulk_form) if bulk_form else None,
                                                  'items': items,
                                                  'items_total': items_total,
                                                 },
@@ -24,12 +24,15 @@ class List(ListWidget):
              ('ban', _("Ban"), 50),
              ('expires', _("Expires")),
              )
-    default_sorting = 'expires'
+    # Expiration date can be empty, so list is sorted from newest bans to use keyset pagination
+    default_sorting = 'id'
     sortables={
+               'id': 0,
                'ban': 1,
                'expires': 0,
               }
     pagination = 20
+    keyset_pagination = True
     search_form = SearchBansForm
     empty_message = _('No bans are currently set.')
     empty_search_message = _('No bans have been found.')
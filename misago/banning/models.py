@@ -2,6 +2,7 @@ import re
 from django.utils import timezone
 from django.db import models
 from django.db.models import Q
+from misago.admin.counts import register as register_counts
 
 
 BAN_NAME_EMAIL = 0
@@ -82,4 +83,7 @@ class BanCache(object):
         return False    
     
     def is_banned(self):
-        return self.banned
\ No newline at end of file
+        return self.banned
+
+
+register_counts(Ban)
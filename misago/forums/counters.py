@@ -0,0 +1,183 @@
+from django.db.models import Count, F, Max, PositiveIntegerField
+from misago.forums.models import Forum, Thread, Post
+from misago.monitor.monitor import Monitor
+from misago.users.models import User
+
+"""
+Denormalized counters maintenance
+
+Changes to forums, threads and users counters made during request are collected in
+buffer and written when request ends, with single UPDATE ... SET x = x + n query for
+every changed row. Forums changes are summed into board totals in monitor. Code running
+outside of request should create its own buffer and flush it when done. Counters count
+only visible posts in visible threads, same as resyncforums command does.
+
+Counters drifting out of sync can be recomputed with resyncforums command.
+"""
+class Counters(object):
+    """
+    Buffer of counters changes
+    """
+    def __init__(self):
+        self.changes = {}
+        self.threads_forums = {}
+
+    def change(self, model, pk, field, delta):
+        if not pk or not delta:
+            return
+        row = self.changes.setdefault((model, pk), {})
+        row[field] = row.get(field, 0) + delta
+
+    def change_forum(self, forum, threads=0, posts=0):
+        self.change(Forum, forum, 'threads', threads)
+        self.change(Forum, forum, 'posts', posts)
+
+    def change_thread(self, thread, forum, replies):
+        self.threads_forums[thread] = forum
+        self.change(Thread, thread, 'replies', replies)
+
+    def change_user(self, user, topics=0, posts=0):
+        self.change(User, user, 'topics', topics)
+        self.change(User, user, 'topics_delta', topics)
+        self.change(User, user, 'posts', posts)
+        self.change(User, user, 'posts_delta', posts)
+
+    def thread_created(self, thread):
+        self.change_forum(thread.forum_id, threads=1, posts=1)
+        self.change_user(thread.start_poster_id, topics=1, posts=1)
+
+    def thread_removed(self, thread):
+        """
+        Count thread and its posts out before thread is hidden or deleted
+        """
+        posts = Post.objects.filter(thread=thread, hidden=False).values('user').annotate(items=Count('id')).order_by()
+        self.change_forum(thread.forum_id, threads=-1, posts=-sum([row['items'] for row in posts]))
+        self.change_user(thread.start_poster_id, topics=-1)
+        for row in posts:
+            self.change_user(row['user'], posts=-row['items'])
+
+    def post_created(self, post):
+        self.change_forum(post.forum_id, posts=1)
+        self.change_thread(post.thread_id, post.forum_id, 1)
+        self.change_user(post.user_id, posts=1)
+
+    def post_removed(self, post):
+        """
+        Count post out after it was hidden or deleted
+        """
+        self.change_forum(post.forum_id, posts=-1)
+        self.change_thread(post.thread_id, post.forum_id, -1)
+        self.change_user(post.user_id, posts=-1)
+
+    def clear(self):
+        self.changes = {}
+        self.threads_forums = {}
+
+    def flush(self, monitor=None):
+        """
+        Write buffered changes to database and invalidate caches displaying changed counters
+        """
+        from misago.forums.threads import invalidate_threads
+        from misago.forums.tree import invalidate_forum_tree
+        forums_changed = False
+        totals = {'threads': 0, 'posts': 0}
+        # Update rows in same order in every request so concurrent flushes dont deadlock
+        for (model, pk), row in sorted(self.changes.items(), key=lambda item: (item[0][0].__name__, item[0][1])):
+            row = dict([(field, delta) for field, delta in row.items() if delta])
+            if not row:
+                continue
+            update_counters(model, pk, row)
+            if model is Forum:
+                forums_changed = True
+                for field in totals.keys():
+                    totals[field] += row.get(field, 0)
+            elif model is Thread:
+                invalidate_threads(self.threads_forums[pk])
+        if forums_changed:
+            invalidate_forum_tree()
+        if totals['threads'] or totals['posts']:
+            monitor = monitor or Monitor()
+            for field, delta in totals.items():
+                if delta:
+                    monitor[field] = max(int(monitor.get(field, 0)) + delta, 0)
+        self.clear()
+
+
+def update_counters(model, pk, changes):
+    """
+    Apply counters changes to row, without taking positive counters below zero
+    """
+    positive = dict([(field, delta) for field, delta in changes.items()
+                     if delta < 0 and isinstance(model._meta.get_field(field), PositiveIntegerField)])
+    conditions = dict([('%s__gte' % field, -delta) for field, delta in positive.items()])
+    if model.objects.filter(pk=pk, **conditions).update(**dict([(field, F(field) + delta) for field, delta in changes.items()])):
+        return
+    for field, delta in changes.items():
+        if field in positive:
+            # Counter has drifted, let it stop at zero
+            if not model.objects.filter(pk=pk, **{'%s__gte' % field: -delta}).update(**{field: F(field) + delta}):
+                model.objects.filter(pk=pk).update(**{field: 0})
+        else:
+            model.objects.filter(pk=pk).update(**{field: F(field) + delta})
+
+
+def get_pk_ranges(model, chunk_size):
+    """
+    Yield primary key ranges covering all model rows
+    """
+    last_pk = model.objects.aggregate(Max('pk'))['pk__max'] or 0
+    for start in range(1, last_pk + 1, chunk_size):
+        yield start, start + chunk_size
+
+
+def count_grouped(queryset, field):
+    """
+    Return dict with number of visible items for every value of field
+    """
+    return dict([(row[field], row['items']) for row in queryset.filter(hidden=False).values(field).annotate(items=Count('id')).order_by()])
+
+
+def update_changed(model, pk_range, counters):
+    """
+    Write recomputed counters of model rows in range, skipping rows that are already correct
+    Return number of updated rows
+    """
+    fields = counters.keys()
+    updated = 0
+    for row in model.objects.filter(pk__gte=pk_range[0], pk__lt=pk_range[1]).values_list('pk', *fields):
+        values = dict([(field, max(counters[field].get(row[0], 0), 0)) for field in fields])
+        if values != dict(zip(fields, row[1:])):
+            model.objects.filter(pk=row[0]).update(**values)
+            updated += 1
+    return updated
+
+
+def resync_threads(chunk_size=1000):
+    updated = 0
+    for start, end in get_pk_ranges(Thread, chunk_size):
+        posts = count_grouped(Post.objects.filter(thread__gte=start, thread__lt=end), 'thread')
+        updated += update_changed(Thread, (start, end), {'replies': dict([(pk, items - 1) for pk, items in posts.items()])})
+    return updated
+
+
+def resync_forums(chunk_size=1000):
+    updated = 0
+    for start, end in get_pk_ranges(Forum, chunk_size):
+        threads = count_grouped(Thread.objects.filter(forum__gte=start, forum__lt=end), 'forum')
+        posts = count_grouped(Post.objects.filter(forum__gte=start, forum__lt=end).filter(thread__hidden=False), 'forum')
+        updated += update_changed(Forum, (start, end), {'threads': threads, 'posts': posts})
+    return updated
+
+
+def resync_users(chunk_size=1000):
+    updated = 0
+    for start, end in get_pk_ranges(User, chunk_size):
+        topics = count_grouped(Thread.objects.filter(start_poster__gte=start, start_poster__lt=end), 'start_poster')
+        posts = count_grouped(Post.objects.filter(user__gte=start, user__lt=end).filter(thread__hidden=False), 'user')
+        updated += update_changed(User, (start, end), {'topics': topics, 'posts': posts})
+    return updated
+
+
+def resync_monitor(monitor):
+    monitor['threads'] = Thread.objects.filter(hidden=False).count()
+    monitor['posts'] = Post.objects.filter(hidden=False).filter(thread__hidden=False).count()
\ No newline at end of file
@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand
+from optparse import make_option
+from misago.forums.counters import resync_threads, resync_forums, resync_users, resync_monitor
+from misago.forums.models import Forum
+from misago.forums.threads import invalidate_threads
+from misago.forums.tree import invalidate_forum_tree
+from misago.monitor.monitor import Monitor
+
+class Command(BaseCommand):
+    """
+    This command recomputes forums, threads and users counters. Run it after restoring backups
+    or whenever counters displayed on forums seem to be wrong.
+    """
+    help = 'Recomputes forums, threads and users counters'
+    option_list = BaseCommand.option_list + (
+        make_option('--chunk',
+            type='int',
+            dest='chunk',
+            default=1000,
+            help='Number of rows counted in single query'),
+        )
+
+    def handle(self, *args, **options):
+        threads = resync_threads(options['chunk'])
+        self.stdout.write('Threads have been resynchronized, %s threads were updated.\n' % threads)
+        forums = resync_forums(options['chunk'])
+        self.stdout.write('Forums have been resynchronized, %s forums were updated.\n' % forums)
+        users = resync_users(options['chunk'])
+        self.stdout.write('Users have been resynchronized, %s users were updated.\n' % users)
+        resync_monitor(Monitor())
+        
+        # Counters were changed with queryset updates, so forget cached data
+        invalidate_forum_tree()
+        for forum in Forum.objects.values_list('pk', flat=True):
+            invalidate_threads(forum)
+        self.stdout.write('Forums counters have been resynchronized.\n')
\ No newline at end of file
@@ -0,0 +1,14 @@
+from misago.forums.counters import Counters
+
+class CountersMiddleware(object):
+    def process_request(self, request):
+        request.counters = Counters()
+
+    def process_exception(self, request, exception):
+        if hasattr(request, 'counters'):
+            request.counters.clear()
+
+    def process_response(self, request, response):
+        if hasattr(request, 'counters'):
+            request.counters.flush(getattr(request, 'monitor', None))
+        return response
\ No newline at end of file
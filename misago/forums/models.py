@@ -1,5 +1,6 @@
 from django.conf import settings
 from django.db import models
+from django.db.models.signals import post_save, post_delete
 from django.utils.translation import ugettext_lazy as _
 from mptt.models import MPTTModel, TreeForeignKey
 
@@ -63,6 +64,7 @@ class Thread(models.Model):
     objects = ThreadManager()
     
     statistics_name = _('New Threads')
+    statistics_date = 'start'
         
     def get_date(self):
         return self.start
@@ -101,6 +103,7 @@ class Post(models.Model):
     objects = PostManager()
     
     statistics_name = _('New Posts')
+    statistics_date = 'date'
     
     def get_date(self):
         return self.date
@@ -158,4 +161,29 @@ class Report(models.Model):
 class Edit(models.Model):
     forum = models.ForeignKey(Forum, related_name='+')
     thread = models.ForeignKey(Thread, related_name='+')
-    post = models.ForeignKey(Post, related_name='+')    
\ No newline at end of file
+    post = models.ForeignKey(Post, related_name='+')    
+
+def forum_saved(sender, instance, raw=False, **kwargs):
+    from misago.forums.tree import patch_forum_tree, invalidate_forum_tree
+    if raw:
+        invalidate_forum_tree()
+    else:
+        patch_forum_tree(instance)
+
+
+def forum_deleted(sender, instance, **kwargs):
+    from misago.forums.tree import invalidate_forum_tree
+    invalidate_forum_tree()
+
+
+post_save.connect(forum_saved, sender=Forum, dispatch_uid='misago.forums.tree.saved')
+post_delete.connect(forum_deleted, sender=Forum, dispatch_uid='misago.forums.tree.deleted')
+
+
+def thread_changed(sender, instance, **kwargs):
+    from misago.forums.threads import invalidate_threads
+    invalidate_threads(instance.forum_id)
+
+
+post_save.connect(thread_changed, sender=Thread, dispatch_uid='misago.forums.threads.saved')
+post_delete.connect(thread_changed, sender=Thread, dispatch_uid='misago.forums.threads.deleted')
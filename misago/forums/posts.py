@@ -0,0 +1,106 @@
+import hashlib
+from collections import namedtuple
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import translation
+from misago.forums.models import Post
+from misago.forums.threads import get_cursor, parse_cursor
+from misago.users.models import User
+
+"""
+Thread posts stream
+
+Posts are listed from oldest, and pages are sliced by keyset (date and post id of page
+boundary) walking (thread, date, id) index created by forums/sql/post.sql.
+
+Posters of whole page are read in single query joined with their ranks, and posts bodies
+are rendered from cache. Cached body is used for as long as post's preparsed content and
+edit date stay same, so edited posts are rendered again without explicit invalidation.
+"""
+PAGE_SIZE = 15
+POST_CACHE_TIME = 86400
+POST_COLUMNS = ('id', 'user', 'user_name', 'post_preparsed', 'date', 'upvotes', 'downvotes',
+                'edited', 'edits', 'edit_date', 'edit_reason', 'edit_user', 'edit_user_name',
+                'edit_user_slug', 'protected')
+PostRow = namedtuple('PostRow', [Post._meta.get_field(column).attname for column in POST_COLUMNS])
+Poster = namedtuple('Poster', ('id', 'username', 'username_slug', 'avatar', 'title', 'rank_name', 'rank_style', 'signature'))
+
+
+def get_page(thread, after=None, before=None):
+    """
+    Return list of thread posts and cursors for previous and next page
+    """
+    posts = Post.objects.filter(thread=thread).filter(hidden=False)
+    if before:
+        date, post = before
+        posts = posts.filter(Q(date__lt=date) | Q(date=date, id__lt=post)).order_by('-date', '-id')
+        posts = [PostRow(*row) for row in posts.values_list(*POST_COLUMNS)[:PAGE_SIZE + 1]]
+        posts.reverse()
+        has_prev = len(posts) > PAGE_SIZE
+        posts = posts[-PAGE_SIZE:]
+        has_next = True
+    else:
+        if after:
+            date, post = after
+            posts = posts.filter(Q(date__gt=date) | Q(date=date, id__gt=post))
+        posts = posts.order_by('date', 'id')
+        posts = [PostRow(*row) for row in posts.values_list(*POST_COLUMNS)[:PAGE_SIZE + 1]]
+        has_next = len(posts) > PAGE_SIZE
+        posts = posts[:PAGE_SIZE]
+        has_prev = bool(after)
+    
+    if not posts:
+        return posts, None, None
+    return posts, get_cursor(posts[0].date, posts[0].id) if has_prev else None, get_cursor(posts[-1].date, posts[-1].id) if has_next else None
+
+
+def get_posters(posts):
+    """
+    Return dict of posters of posts list, read with their ranks in one query
+    """
+    posters = {}
+    users = set([post.user_id for post in posts if post.user_id])
+    if not users:
+        return posters
+    for row in User.objects.filter(pk__in=users).values_list('id', 'username', 'username_slug', 'email_hash',
+                                                            'avatar_type', 'avatar_image', 'title', 'rank__name',
+                                                            'rank__title', 'rank__style', 'signature_preparsed'):
+        pk, username, username_slug, email_hash, avatar_type, avatar_image, title, rank_name, rank_title, rank_style, signature = row
+        user = User(pk=pk, email_hash=email_hash, avatar_type=avatar_type, avatar_image=avatar_image)
+        posters[pk] = Poster(pk, username, username_slug, user.get_avatar(), title or rank_title, rank_name, rank_style, signature)
+    return posters
+
+
+def get_post_key(request, post):
+    version = hashlib.md5(('%s:%s' % (post.edit_date, post.post_preparsed)).encode('utf-8')).hexdigest()
+    return 'misago.forums.posts.%s.%s.%s.%s' % (post.id, request.theme.get_theme(), translation.get_language(), version)
+
+
+def render_posts(request, posts):
+    """
+    Return list of rendered bodies of posts, rendering only posts missing in cache
+    """
+    keys = [get_post_key(request, post) for post in posts]
+    rendered = cache.get_many(keys)
+    missing = {}
+    for key, post in zip(keys, posts):
+        if not key in rendered:
+            rendered[key] = missing[key] = request.theme.render_to_string('forums/post_body.html', {'post': post})
+    if missing:
+        cache.set_many(missing, POST_CACHE_TIME)
+    return [rendered[key] for key in keys]
+
+
+def get_posts(request, thread, after=None, before=None):
+    """
+    Return dict with page of thread posts, their posters and rendered bodies, and pagination cursors
+    """
+    after = parse_cursor(after) if after else None
+    before = parse_cursor(before) if before else None
+    posts, prev, next = get_page(thread, after, before)
+    posters = get_posters(posts)
+    return {
+            'posts': [(post, posters.get(post.user_id), body) for post, body in zip(posts, render_posts(request, posts))],
+            'prev': prev,
+            'next': next,
+            }
\ No newline at end of file
@@ -0,0 +1 @@
+CREATE INDEX forums_post_thread_date_id ON forums_post (thread_id, date, id);
\ No newline at end of file
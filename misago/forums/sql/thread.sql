@@ -0,0 +1 @@
+CREATE INDEX forums_thread_forum_hidden_last_id ON forums_thread (forum_id, hidden, last, id);
\ No newline at end of file
@@ -0,0 +1,100 @@
+import calendar
+from collections import namedtuple
+from datetime import datetime, timedelta
+from django.core.cache import cache
+from django.db.models import Q
+from django.utils import timezone
+from misago.forums.models import Thread
+from misago.utils.versions import get_version, bump_version
+
+"""
+Forum threads lists
+
+Threads are listed from newest reply, and pages are sliced by keyset (last reply date
+and thread id of page boundary) instead of offset, so deep pages cost as much as first
+one. Both are walked by (forum, hidden, last, id) index created by forums/sql/thread.sql.
+
+Only columns displayed on list are read, and rows are kept as tuples. First page of every
+forum is cached until thread in it is saved or deleted.
+"""
+PAGE_SIZE = 30
+PAGE_CACHE_TIME = 300
+THREAD_COLUMNS = ('id', 'name', 'slug', 'replies', 'views', 'start', 'start_poster',
+                  'start_poster_name', 'start_poster_slug', 'last', 'last_poster',
+                  'last_poster_name', 'last_poster_slug', 'closed')
+ThreadRow = namedtuple('ThreadRow', [Thread._meta.get_field(column).attname for column in THREAD_COLUMNS])
+
+
+def get_cursor(date, pk):
+    return '%s-%06d-%s' % (calendar.timegm(date.utctimetuple()), date.microsecond, pk)
+
+
+def parse_cursor(cursor):
+    """
+    Turn cursor into tuple with date and primary key, or None if its invalid
+    """
+    try:
+        timestamp, microsecond, pk = [int(i) for i in cursor.split('-')]
+        date = datetime.utcfromtimestamp(timestamp) + timedelta(microseconds=microsecond)
+        return date.replace(tzinfo=timezone.utc), pk
+    except (AttributeError, ValueError, OverflowError):
+        return None
+
+
+def get_threads_version(forum):
+    return get_version('misago.forums.threads.%s' % forum)
+
+
+def invalidate_threads(forum):
+    """
+    Forget cached first page of forum threads list.
+    Call it after changes to threads that dont send signals, like queryset updates.
+    """
+    bump_version('misago.forums.threads.%s' % forum)
+
+
+def get_page(forum, after=None, before=None):
+    """
+    Return list of forum threads and cursors for previous and next page
+    """
+    threads = Thread.objects.filter(forum=forum).filter(hidden=False)
+    if before:
+        last, thread = before
+        threads = threads.filter(Q(last__gt=last) | Q(last=last, id__gt=thread)).order_by('last', 'id')
+        threads = [ThreadRow(*row) for row in threads.values_list(*THREAD_COLUMNS)[:PAGE_SIZE + 1]]
+        threads.reverse()
+        has_prev = len(threads) > PAGE_SIZE
+        threads = threads[-PAGE_SIZE:]
+        has_next = True
+    else:
+        if after:
+            last, thread = after
+            threads = threads.filter(Q(last__lt=last) | Q(last=last, id__lt=thread))
+        threads = threads.order_by('-last', '-id')
+        threads = [ThreadRow(*row) for row in threads.values_list(*THREAD_COLUMNS)[:PAGE_SIZE + 1]]
+        has_next = len(threads) > PAGE_SIZE
+        threads = threads[:PAGE_SIZE]
+        has_prev = bool(after)
+    
+    if not threads:
+        return threads, None, None
+    return threads, get_cursor(threads[0].last, threads[0].id) if has_prev else None, get_cursor(threads[-1].last, threads[-1].id) if has_next else None
+
+
+def get_threads(forum, after=None, before=None):
+    """
+    Return dict with page of forum threads and pagination cursors
+    """
+    after = parse_cursor(after) if after else None
+    before = parse_cursor(before) if before else None
+    if after or before:
+        threads, prev, next = get_page(forum, after, before)
+        return {'threads': threads, 'prev': prev, 'next': next}
+    
+    cache_key = 'misago.forums.threads.%s.%s' % (forum, get_threads_version(forum))
+    page = cache.get(cache_key)
+    if page is None:
+        threads, prev, next = get_page(forum)
+        page = {'threads': threads, 'prev': prev, 'next': next}
+        cache.set(cache_key, page, PAGE_CACHE_TIME)
+    return page
\ No newline at end of file
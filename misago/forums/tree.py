@@ -0,0 +1,165 @@
+from collections import namedtuple
+from django.core.cache import cache
+from django.db.models.expressions import ExpressionNode
+from misago.forums.models import Forum
+from misago.utils.versions import get_version, bump_version
+
+"""
+Forums tree shared by board index
+
+Whole tree with its counters and last thread data is read by single query into compact
+structure: nodes are tuples stored in tree order, with parents and children kept in arrays
+of nodes positions. Tree is cached in shared cache together with its version, and every
+process keeps its own copy until version changes.
+
+Saving forum doesn't rebuild tree when forum keeps its place in it. Instead forum's node
+is replaced in tree and new tree version is stored in cache.
+"""
+FORUM_COLUMNS = ('id', 'parent', 'tree_id', 'lft', 'rght', 'level', 'role', 'special',
+                 'name', 'slug', 'style', 'description_preparsed', 'threads', 'posts',
+                 'last_thread', 'last_thread_name', 'last_thread_slug', 'last_thread_date',
+                 'last_poster', 'last_poster_name', 'last_poster_slug', 'last_poster_style',
+                 'closed')
+ForumNode = namedtuple('ForumNode', [Forum._meta.get_field(column).attname for column in FORUM_COLUMNS])
+_tree = None
+
+
+class ForumTree(object):
+    """
+    Forums tree with nodes in tree order
+    """
+    def __init__(self, version, rows):
+        self.version = version
+        self.nodes = []
+        self.index = {}
+        self.parents = []
+        self.children = []
+        self.roots = []
+        for row in rows:
+            node = ForumNode(*row)
+            position = len(self.nodes)
+            parent = self.index.get(node.parent_id, -1)
+            self.nodes.append(node)
+            self.index[node.id] = position
+            self.parents.append(parent)
+            self.children.append([])
+            if parent < 0:
+                self.roots.append(position)
+            else:
+                self.children[parent].append(position)
+
+    def get(self, pk):
+        try:
+            return self.nodes[self.index[pk]]
+        except KeyError:
+            return None
+
+    def get_roots(self):
+        return [self.nodes[position] for position in self.roots]
+
+    def get_children(self, node):
+        return [self.nodes[position] for position in self.children[self.index[node.id]]]
+
+    def get_parents(self, node):
+        """
+        Return list of node ancestors, starting from root
+        """
+        parents = []
+        position = self.parents[self.index[node.id]]
+        while position >= 0:
+            parents.append(self.nodes[position])
+            position = self.parents[position]
+        parents.reverse()
+        return parents
+
+    def get_totals(self, node):
+        """
+        Return tuple with number of threads and posts in node and its descendants
+        """
+        threads, posts = node.threads, node.posts
+        position = self.index[node.id] + 1
+        while position < len(self.nodes) and self.nodes[position].level > node.level:
+            threads += self.nodes[position].threads
+            posts += self.nodes[position].posts
+            position += 1
+        return threads, posts
+
+    def can_patch(self, node):
+        """
+        Check if node can replace existing node without changing tree structure
+        """
+        old_node = self.get(node.id)
+        if not old_node:
+            return False
+        return (old_node.parent_id, old_node.tree_id, old_node.lft, old_node.rght, old_node.level) == (node.parent_id, node.tree_id, node.lft, node.rght, node.level)
+
+    def patch(self, node):
+        self.nodes[self.index[node.id]] = node
+
+
+def get_tree_version():
+    return get_version('misago.forums.tree.version')
+
+
+def invalidate_forum_tree():
+    """
+    Make all processes rebuild forums tree.
+    Call it after changes to forums that dont send signals, like MPTT moves or queryset updates.
+    """
+    bump_version('misago.forums.tree.version')
+
+
+def build_forum_tree(version):
+    return ForumTree(version, Forum.objects.order_by('tree_id', 'lft').values_list(*FORUM_COLUMNS))
+
+
+def get_forum_tree():
+    """
+    Return current forums tree, building it only when no other process did it before
+    """
+    global _tree
+    version = get_tree_version()
+    if version is None:
+        # Cache cant keep tree version, so other processes changes cant be noticed
+        return build_forum_tree(version)
+    if _tree and _tree.version == version:
+        return _tree
+    
+    tree = cache.get('misago.forums.tree')
+    if not tree or tree.version != version:
+        tree = build_forum_tree(version)
+        cache.set('misago.forums.tree', tree)
+    _tree = tree
+    return tree
+
+
+def get_forum_node(forum):
+    node = ForumNode(*[getattr(forum, field) for field in ForumNode._fields])
+    for value in node:
+        if isinstance(value, ExpressionNode):
+            # Forum was saved with F() expression, so its real values are known only to database
+            return None
+    return node
+
+
+def patch_forum_tree(forum):
+    """
+    Replace saved forum's node in tree, or invalidate tree if forum changed its place in it
+    """
+    global _tree
+    tree = get_forum_tree()
+    node = get_forum_node(forum)
+    if not node or not tree.can_patch(node):
+        invalidate_forum_tree()
+        return
+    if tree.get(node.id) == node:
+        return
+    
+    version = bump_version('misago.forums.tree.version')
+    if tree.version is None or version != tree.version + 1:
+        # Other process has changed tree in meantime, leave rebuilding it to next request
+        _tree = None
+        return
+    tree.patch(node)
+    tree.version = version
+    cache.set('misago.forums.tree', tree)
\ No newline at end of file
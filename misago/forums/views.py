@@ -1 +1,49 @@
-# Create your views here.
+from django.core.urlresolvers import reverse
+from django.shortcuts import redirect
+from django.template import RequestContext
+from misago.forums.models import Thread
+from misago.forums.posts import get_posts
+from misago.forums.threads import get_threads
+from misago.forums.tree import get_forum_tree
+from misago.views import error404
+
+def forum(request, slug, forum):
+    forums_tree = get_forum_tree()
+    forum = forums_tree.get(int(forum))
+    if not forum or forum.role != 'for':
+        return error404(request)
+    if forum.slug != slug:
+        return redirect(reverse('forum', kwargs={'slug': forum.slug, 'forum': forum.id}))
+    
+    return request.theme.render_to_response('forums/forum.html',
+                                            {
+                                             'forum': forum,
+                                             'parents': forums_tree.get_parents(forum),
+                                             'subforums': forums_tree.get_children(forum),
+                                             'page': get_threads(forum.id, request.GET.get('after'), request.GET.get('before')),
+                                             'page_url': reverse('forum', kwargs={'slug': forum.slug, 'forum': forum.id}),
+                                             },
+                                            context_instance=RequestContext(request));
+
+
+def thread(request, slug, thread):
+    try:
+        thread = Thread.objects.defer('poster_styles_list').get(pk=thread, hidden=False)
+    except Thread.DoesNotExist:
+        return error404(request)
+    forums_tree = get_forum_tree()
+    forum = forums_tree.get(thread.forum_id)
+    if not forum or forum.role != 'for':
+        return error404(request)
+    if thread.slug != slug:
+        return redirect(reverse('thread', kwargs={'slug': thread.slug, 'thread': thread.pk}))
+    
+    return request.theme.render_to_response('forums/thread.html',
+                                            {
+                                             'forum': forum,
+                                             'parents': forums_tree.get_parents(forum),
+                                             'thread': thread,
+                                             'page': get_posts(request, thread.pk, request.GET.get('after'), request.GET.get('before')),
+                                             'page_url': reverse('thread', kwargs={'slug': thread.slug, 'thread': thread.pk}),
+                                             },
+                                            context_instance=RequestContext(request));
@@ -0,0 +1,44 @@
+import time
+from optparse import make_option
+from django.core.management.base import BaseCommand
+from misago.mailing.queue import DeliveryException, deliver_queue
+
+class Command(BaseCommand):
+    """
+    This command delivers queued e-mails. Run it from CRON, or keep it running with --loop option.
+    """
+    help = 'Delivers queued e-mails'
+    option_list = BaseCommand.option_list + (
+        make_option('--loop',
+            action='store_true',
+            dest='loop',
+            default=False,
+            help='Keep checking queue for new messages'),
+        make_option('--batch',
+            type='int',
+            dest='batch',
+            default=100,
+            help='Number of messages sent over one connection'),
+        )
+    def handle(self, *args, **options):
+        sent = 0
+        backoff = 5
+        while True:
+            try:
+                batch_sent = deliver_queue(options['batch'])
+            except DeliveryException as e:
+                self.stderr.write('Could not connect to mail server: %s\n' % e)
+                if not options['loop']:
+                    break
+                # Wait longer after each failure, but no longer than five minutes
+                time.sleep(backoff)
+                backoff = min(backoff * 2, 300)
+                continue
+            backoff = 5
+            sent += batch_sent
+            if not options['loop']:
+                if not batch_sent:
+                    break
+            elif not batch_sent:
+                time.sleep(5)
+        self.stdout.write('%s e-mails have been sent.\n' % sent)
\ No newline at end of file
@@ -0,0 +1,15 @@
+from django.db import models
+
+class QueuedMail(models.Model):
+    """
+    Misago outgoing e-mail message waiting for delivery
+    """
+    subject = models.CharField(max_length=255)
+    sender = models.CharField(max_length=255,null=True,blank=True)
+    recipient = models.CharField(max_length=255)
+    body_text = models.TextField()
+    body_html = models.TextField(null=True,blank=True)
+    created = models.DateTimeField()
+    send_after = models.DateTimeField(db_index=True)
+    attempts = models.PositiveIntegerField(default=0)
+    last_error = models.TextField(null=True,blank=True)
\ No newline at end of file
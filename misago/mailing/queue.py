@@ -0,0 +1,137 @@
+import logging
+from datetime import timedelta
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import F
+from django.utils import timezone
+from misago.mailing.models import QueuedMail
+
+"""
+Outgoing mail queue
+
+Messages are rendered in request and saved to database. Worker (sendqueuedmail
+command) delivers them in batches, reusing one connection for whole batch.
+Before message is sent, worker claims it by moving its send date forward,
+so other workers skip it. Messages are deleted as soon as they are sent, and messages
+that failed are retried later, waiting longer after each attempt. Messages claimed
+by worker that died are sent again when their claim expires. Messages that failed
+MAILING_MAX_ATTEMPTS times are logged and deleted.
+"""
+CLAIM_TIME = timedelta(minutes=10)
+
+logger = logging.getLogger('misago.mailing')
+
+
+class DeliveryException(Exception):
+    """
+    Raised when worker cant connect to mail server
+    """
+    pass
+
+
+def queue_mail(subject, recipient, body_text, body_html=None, sender=None):
+    """
+    Save message for delivery, or send it right away if queue is disabled
+    """
+    sender = sender or settings.EMAIL_HOST_USER
+    if not settings.MAILING_QUEUE:
+        email = EmailMultiAlternatives(subject, body_text, sender, [recipient])
+        if body_html:
+            email.attach_alternative(body_html, "text/html")
+        email.send()
+        return None
+    return QueuedMail.objects.create(
+                                     subject=subject,
+                                     sender=sender,
+                                     recipient=recipient,
+                                     body_text=body_text,
+                                     body_html=body_html,
+                                     created=timezone.now(),
+                                     send_after=timezone.now(),
+                                     )
+
+
+def get_retry_delay(attempts):
+    """
+    Wait 2, 4, 8... minutes between attempts, but no longer than day
+    """
+    return timedelta(minutes=min(2 ** attempts, 1440))
+
+
+def claim_mail(mail):
+    """
+    Claim message for delivery, returning False if other worker did it first
+    """
+    claimed = QueuedMail.objects.filter(pk=mail.pk, send_after=mail.send_after, attempts=mail.attempts).update(
+                                        send_after=timezone.now() + CLAIM_TIME, attempts=F('attempts') + 1)
+    if claimed:
+        mail.attempts += 1
+    return bool(claimed)
+
+
+def purge_failed():
+    """
+    Log and delete messages that wont be sent again, returning their number
+    """
+    failed = QueuedMail.objects.filter(attempts__gte=settings.MAILING_MAX_ATTEMPTS).filter(send_after__lte=timezone.now())
+    purged = 0
+    for mail in failed.order_by('id')[:100]:
+        logger.error('E-mail "%s" to %s has not been sent after %s attempts: %s',
+                     mail.subject, mail.recipient, mail.attempts, mail.last_error)
+        QueuedMail.objects.filter(pk=mail.pk).delete()
+        purged += 1
+    return purged
+
+
+def open_connection(connection):
+    try:
+        connection.open()
+    except Exception as e:
+        close_connection(connection)
+        raise DeliveryException(unicode(e))
+
+
+def close_connection(connection):
+    try:
+        connection.close()
+    except Exception:
+        # Server went away, there is nothing left to close
+        pass
+
+
+def deliver_queue(batch_size=100, connection=None):
+    """
+    Deliver batch of waiting messages and return number of messages sent
+    Raises DeliveryException if connection to mail server cant be opened
+    """
+    purge_failed()
+    messages = [mail for mail in QueuedMail.objects.filter(send_after__lte=timezone.now())
+                                                      .filter(attempts__lt=settings.MAILING_MAX_ATTEMPTS)
+                                                      .order_by('id')[:batch_size]]
+    if not messages:
+        return 0
+    
+    connection = connection or get_connection(settings.MAILING_BACKEND)
+    open_connection(connection)
+    sent = 0
+    try:
+        for mail in messages:
+            if not claim_mail(mail):
+                continue
+            email = EmailMultiAlternatives(mail.subject, mail.body_text, mail.sender, [mail.recipient], connection=connection)
+            if mail.body_html:
+                email.attach_alternative(mail.body_html, "text/html")
+            try:
+                email.send()
+            except Exception as e:
+                QueuedMail.objects.filter(pk=mail.pk).update(send_after=timezone.now() + get_retry_delay(mail.attempts),
+                                                             last_error=unicode(e))
+                # Connection may be broken now, open new one for rest of batch
+                close_connection(connection)
+                open_connection(connection)
+            else:
+                QueuedMail.objects.filter(pk=mail.pk).delete()
+                sent += 1
+    finally:
+        close_connection(connection)
+    return sent
\ No newline at end of file
@@ -27,7 +27,7 @@ class Monitor(object):
         return self._items[key][0]
 
     def __setitem__(self, key, value):
-        self._items[key][0] = value
+        self._items[key] = [value, timezone.now()]
         cache.set('misago.monitor', self._items)
         sync_item = Item(id=key, value=value, updated=timezone.now())
         sync_item.save()
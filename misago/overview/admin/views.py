@@ -1,8 +1,11 @@
+import csv
+import json
 from datetime import datetime, timedelta
+from StringIO import StringIO
 from django.conf import settings
 from django.core.urlresolvers import reverse
 from django.db import models
-from django.http import Http404
+from django.http import Http404, HttpResponse
 from django.shortcuts import redirect
 from django.template import RequestContext
 from django.utils import formats, timezone
@@ -12,6 +15,7 @@ from misago.forms import FormLayout
 from misago.forums.models import Thread, Post
 from misago.messages import Message, BasicMessage
 from misago.overview.admin.forms import GenerateStatisticsForm
+from misago.overview.stats import count_items, iterate_items
 from misago.sessions.models import Session
 from misago.users.models import User
 
@@ -122,11 +126,76 @@ def overview_graph(request, model, date_start, date_end, precision):
     return request.theme.render_to_response('overview/stats/graph.html', {
                                             'title': models_map[model].statistics_name,
                                             'graph': build_graph(models_map[model], date_start, date_end, precision),
+                                            'export_csv': reverse('admin_overview_export', kwargs=export_kwargs(model, date_start, date_end, precision, 'csv')),
+                                            'export_json': reverse('admin_overview_export', kwargs=export_kwargs(model, date_start, date_end, precision, 'json')),
                                             'form': FormLayout(form),
                                             'message': request.messages.get_message('admin_stats'),
                                             }, context_instance=RequestContext(request));
 
 
+def overview_export(request, model, date_start, date_end, precision, format):
+    """
+    Stream number of model items in each step of any time range as CSV or JSON
+    Middlewares reading response content, like GZipMiddleware or CommonMiddleware with USE_ETAGS,
+    will load whole export into memory before it is sent, dont enable them for admin.
+    """
+    steps = {'hour': 3600, 'day': 86400, 'week': 604800, 'month': 2592000, 'year': 31536000}
+    models_map = {}
+    for model_obj in models.get_models():
+        if hasattr(model_obj.objects, 'filter_overview'):
+            models_map[str(model_obj.__name__).lower()] = model_obj
+    if not model in models_map or not precision in steps:
+        raise Http404()
+    
+    date_start = timezone.make_aware(datetime.strptime(date_start, '%Y-%m-%d'), timezone.get_current_timezone())
+    date_end = timezone.make_aware(datetime.strptime(date_end, '%Y-%m-%d'), timezone.get_current_timezone())
+    if date_start > date_end:
+        date_start, date_end = date_end, date_start
+    if date_start == date_end:
+        raise Http404()
+    
+    rows = iterate_items(models_map[model], date_start, date_end, steps[precision])
+    filename = '%s-%s-%s-%s.%s' % (model, date_start.strftime('%Y%m%d'), date_end.strftime('%Y%m%d'), precision, format)
+    if format == 'json':
+        response = HttpResponse(export_json(rows), content_type='application/json')
+    else:
+        response = HttpResponse(export_csv(rows), content_type='text/csv')
+    response['Content-Disposition'] = 'attachment; filename="%s"' % filename
+    return response
+
+
+def export_kwargs(model, date_start, date_end, precision, format):
+    return {
+            'model': model,
+            'date_start': date_start.strftime('%Y-%m-%d'),
+            'date_end': date_end.strftime('%Y-%m-%d'),
+            'precision': precision,
+            'format': format,
+            }
+
+
+def export_csv(rows):
+    buffer = StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(['date', 'items'])
+    for date, items in rows:
+        writer.writerow([date.isoformat(), items])
+        if buffer.tell() > 8192:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def export_json(rows):
+    yield '['
+    separator = ''
+    for date, items in rows:
+        yield '%s%s' % (separator, json.dumps({'date': date.isoformat(), 'items': items}))
+        separator = ','
+    yield ']'
+
+
 def check_dates(date_start, date_end, precision):
     date_diff = date_end - date_start
     date_diff = date_diff.seconds + date_diff.days * 86400
@@ -170,7 +239,37 @@ def build_graph(model, date_start, date_end, precision):
     
     date_end = timezone.make_aware(date_end, timezone.get_current_timezone())
     date_start = timezone.make_aware(date_start, timezone.get_current_timezone())
+    return build_timeline(model, date_start, date_end, step, format)
+
+
+def build_stat(model, mode):
+    """
+    Build graph for last day, week, month or year
+    """
+    date_end = timezone.now()
+    if mode in ('week', 'month', 'year'):
+        # End graph at midnight so its steps can be read from daily rollups
+        date_end = date_end.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+    if mode == 'week':
+        date_start = date_end - timedelta(days=7)
+        format = 'F j, Y'
+        step = 86400
+    elif mode == 'month':
+        date_start = date_end - timedelta(days=30)
+        format = 'F j, Y'
+        step = 86400
+    elif mode == 'year':
+        date_start = date_end - timedelta(days=365)
+        format = 'F, Y'
+        step = 2592000
+    else:
+        date_start = date_end - timedelta(days=1)
+        format = 'H:i'
+        step = 3600
+    return build_timeline(model, date_start, date_end, step, format)
     
+    
+def build_timeline(model, date_start, date_end, step, format):
     date_diff = date_end - date_start
     date_diff = date_diff.seconds + date_diff.days * 86400
     steps = int(math.ceil(float(date_diff / step))) + 1
@@ -179,17 +278,9 @@ def build_graph(model, date_start, date_end, precision):
         step_date = date_end - timedelta(seconds=(i * step));
         timeline[steps - i - 1] = step_date    
     stat = {'total': 0, 'max': 0, 'stat': [0 for i in range(0, steps)], 'timeline': timeline, 'start': date_start, 'end': date_end, 'format': format}
-        
-    # Loop model items
-    for item in model.objects.filter_overview(date_start, date_end).iterator():
-        date_diff = date_end - item.get_date()
-        date_diff = date_diff.seconds + date_diff.days * 86400
-        date_diff = steps - int(math.floor(float(date_diff / step))) - 2
-        stat['stat'][date_diff] += 1
-        stat['total'] += 1
-        
-    # Find max
-    for i in stat['stat']:
-        if i > stat['max']:
-            stat['max'] = i
+    
+    # Count model items in steps
+    stat['stat'] = count_items(model, date_start, date_end, step, steps)
+    stat['total'] = sum(stat['stat'])
+    stat['max'] = max(stat['stat'])
     return stat
\ No newline at end of file
@@ -0,0 +1,49 @@
+from datetime import timedelta
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import models
+from django.db.models import Min
+from django.utils import timezone
+from misago.monitor.monitor import Monitor
+from misago.overview.models import Rollup, get_provider_name, invalidate_statistics, is_provider
+from misago.overview.stats import count_in_database, count_in_python, BUCKET_SQL
+
+class Command(BaseCommand):
+    """
+    This command is used to build daily statistics rollups from existing items
+    """
+    help = 'Builds daily statistics rollups'
+    def handle(self, *args, **options):
+        monitor = Monitor()
+        for model in models.get_models():
+            if not is_provider(model):
+                continue
+            provider = get_provider_name(model)
+            Rollup.objects.filter(provider=provider).delete()
+            
+            first_date = model.objects.aggregate(first=Min(model.statistics_date))['first']
+            if first_date:
+                if timezone.is_aware(first_date):
+                    first_date = timezone.localtime(first_date, timezone.utc)
+                date_start = first_date.replace(hour=0, minute=0, second=0, microsecond=0)
+                date_end = timezone.now().astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0) + timedelta(days=1)
+                if not timezone.is_aware(date_start):
+                    date_start = timezone.make_aware(date_start, timezone.utc)
+                days = (date_end - date_start).days
+                steps = days + 1
+                
+                queryset = model.objects.filter_overview(date_start, date_end)
+                if settings.DATABASES['default']['ENGINE'] in BUCKET_SQL:
+                    stat = count_in_database(model, queryset, date_end, 86400, steps)
+                else:
+                    stat = count_in_python(model, queryset, date_end, 86400, steps)
+                
+                rollups = []
+                for i, items in enumerate(stat):
+                    if items:
+                        rollups.append(Rollup(provider=provider, day=(date_end - timedelta(days=steps - 1 - i)).date(), items=items))
+                Rollup.objects.bulk_create(rollups)
+            
+            monitor['rollups_%s' % provider] = 1
+            invalidate_statistics(model)
+            self.stdout.write('Statistics rollups for "%s" have been built.\n' % model.statistics_name)
\ No newline at end of file
@@ -0,0 +1,84 @@
+from django.db import models, IntegrityError
+from django.db.models import F
+from django.db.models.signals import post_save, post_delete
+from django.utils import timezone
+from misago.utils.versions import get_version, bump_version
+
+class RollupManager(models.Manager):
+    """
+    Daily statistics manager
+    """
+    def get_day(self, date):
+        if timezone.is_aware(date):
+            date = timezone.localtime(date, timezone.utc)
+        return date.date()
+    
+    def change_items(self, provider, date, change):
+        day = self.get_day(date)
+        if not self.filter(provider=provider, day=day).update(items=F('items') + change):
+            try:
+                Rollup(provider=provider, day=day, items=max(change, 0)).save(force_insert=True)
+            except IntegrityError:
+                self.filter(provider=provider, day=day).update(items=F('items') + change)
+
+
+class Rollup(models.Model):
+    """
+    Misago statistics rollup
+    Number of statistics provider's items created on single day (in UTC)
+    """
+    provider = models.CharField(max_length=255)
+    day = models.DateField()
+    items = models.IntegerField(default=0)
+    
+    objects = RollupManager()
+    
+    class Meta:
+        unique_together = (('provider', 'day'),)
+
+
+def get_provider_name(model):
+    return str(model.__name__).lower()
+
+
+def get_statistics_version(model):
+    return get_version('misago.overview.stats.%s' % get_provider_name(model))
+
+
+def invalidate_statistics(model):
+    """
+    Forget cached statistics of provider, including closed windows.
+    Call it after changes to items from past.
+    """
+    bump_version('misago.overview.stats.%s' % get_provider_name(model))
+
+
+def is_backdated(date):
+    """
+    Tell if item date falls into statistics windows that may be closed and cached already.
+    Closed windows end at midnight, in UTC or in forum timezone.
+    """
+    now = timezone.now()
+    return date < max(now.astimezone(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0),
+                      timezone.localtime(now).replace(hour=0, minute=0, second=0, microsecond=0))
+
+
+def is_provider(model):
+    return hasattr(model, 'statistics_date') and hasattr(model.objects, 'filter_overview')
+
+
+def rollup_item_saved(sender, instance, created, raw=False, **kwargs):
+    if created and not raw and is_provider(sender) and getattr(instance, sender.statistics_date):
+        Rollup.objects.change_items(get_provider_name(sender), getattr(instance, sender.statistics_date), 1)
+        if is_backdated(getattr(instance, sender.statistics_date)):
+            invalidate_statistics(sender)
+
+
+def rollup_item_deleted(sender, instance, **kwargs):
+    if is_provider(sender) and getattr(instance, sender.statistics_date):
+        Rollup.objects.change_items(get_provider_name(sender), getattr(instance, sender.statistics_date), -1)
+        invalidate_statistics(sender)
+
+
+post_save.connect(rollup_item_saved, dispatch_uid='misago.overview.rollup_item_saved')
+post_delete.connect(rollup_item_deleted, dispatch_uid='misago.overview.rollup_item_deleted')
\ No newline at end of file
@@ -0,0 +1,154 @@
+import calendar
+import time
+from datetime import datetime, timedelta
+from django.conf import settings
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import Count
+from django.utils import timezone
+from misago.monitor.monitor import Monitor
+from misago.overview.models import Rollup, get_provider_name, get_statistics_version
+use_numpy = True
+try:
+    import numpy
+except ImportError:
+    use_numpy = False
+
+"""
+Statistics engine counting model items in time buckets
+
+Buckets are steps of fixed length going back from end date. When database supports it,
+items are bucketed by GROUP BY query. Otherwise only items dates are fetched and binned in Python.
+Graphs with steps of whole days are read from daily rollups once those are built for the model.
+
+Counts are cached. Windows that ended in past are cached until provider's statistics version
+changes, windows reaching present only for short time.
+"""
+BUCKET_SQL = {
+    'django.db.backends.postgresql_psycopg2': 'FLOOR((%(end)d - EXTRACT(EPOCH FROM %(field)s)) / %(step)d)',
+    'django.db.backends.postgresql': 'FLOOR((%(end)d - EXTRACT(EPOCH FROM %(field)s)) / %(step)d)',
+    'django.db.backends.mysql': 'FLOOR((%(end)d - UNIX_TIMESTAMP(%(field)s)) / %(step)d)',
+    'django.db.backends.sqlite3': '((%(end)d - CAST(strftime(\'%%%%s\', %(field)s) AS INTEGER)) / %(step)d)',
+}
+
+
+def get_timestamp(date):
+    return calendar.timegm(date.utctimetuple())
+
+
+def get_bucket_index(bucket, steps):
+    """
+    Turn number of steps between item date and end date into index on timeline
+    """
+    return min(max(steps - int(bucket) - 2, 0), steps - 1)
+
+
+def count_in_database(model, queryset, date_end, step, steps):
+    """
+    Count items in buckets using GROUP BY query
+    """
+    bucket_sql = BUCKET_SQL[settings.DATABASES['default']['ENGINE']] % {
+        'end': get_timestamp(date_end),
+        'field': '%s.%s' % (connection.ops.quote_name(model._meta.db_table),
+                            connection.ops.quote_name(model._meta.get_field(model.statistics_date).column)),
+        'step': step,
+    }
+    stat = [0 for i in range(0, steps)]
+    buckets = queryset.extra(select={'bucket': bucket_sql}).values('bucket').annotate(items=Count(model._meta.pk.name)).order_by()
+    for bucket in buckets:
+        stat[get_bucket_index(bucket['bucket'], steps)] += bucket['items']
+    return stat
+
+
+def count_in_python(model, queryset, date_end, step, steps):
+    """
+    Fetch only items dates and bin them into buckets
+    """
+    date_end = get_timestamp(date_end)
+    dates = queryset.values_list(model.statistics_date, flat=True).order_by()
+    if use_numpy:
+        dates = numpy.fromiter((get_timestamp(date) for date in dates.iterator()), dtype=numpy.int64)
+        buckets = numpy.floor_divide(date_end - dates, step)
+        buckets = numpy.clip(steps - buckets - 2, 0, steps - 1)
+        return [int(i) for i in numpy.bincount(buckets, minlength=steps)]
+    stat = [0 for i in range(0, steps)]
+    for date in dates.iterator():
+        stat[get_bucket_index((date_end - get_timestamp(date)) // step, steps)] += 1
+    return stat
+
+
+def get_day_date(day):
+    return datetime(day.year, day.month, day.day, tzinfo=timezone.utc)
+
+
+def can_use_rollups(model, date_start, date_end, step):
+    """
+    Rollups can replace items only when steps are made of whole UTC days
+    """
+    if step % 86400 or get_timestamp(date_start) % 86400 or get_timestamp(date_end) % 86400:
+        return False
+    return bool(Monitor().get('rollups_%s' % get_provider_name(model)))
+
+
+def count_in_rollups(model, date_start, date_end, step, steps):
+    """
+    Sum daily rollups into buckets
+    """
+    date_end = get_timestamp(date_end)
+    stat = [0 for i in range(0, steps)]
+    rollups = Rollup.objects.filter(provider=get_provider_name(model))
+    rollups = rollups.filter(day__gte=datetime.utcfromtimestamp(get_timestamp(date_start)).date()).filter(day__lt=datetime.utcfromtimestamp(date_end).date())
+    for day, items in rollups.values_list('day', 'items').iterator():
+        # Place day by its middle so it falls into same bucket as its items
+        stat[get_bucket_index((date_end - get_timestamp(get_day_date(day)) - 43200) // step, steps)] += items
+    return stat
+
+
+def count_items(model, date_start, date_end, step, steps):
+    """
+    Return list with number of model items in each step
+    """
+    cache_key = 'misago.overview.stats.%s.%s.%s.%s.%s.%s.%s' % (get_provider_name(model), get_statistics_version(model),
+                                                                 get_timestamp(date_start), date_start.microsecond,
+                                                                 get_timestamp(date_end), step, steps)
+    stat = cache.get(cache_key)
+    if stat is None:
+        stat = count_steps(model, date_start, date_end, step, steps)
+        if get_timestamp(date_end) < time.time():
+            cache.set(cache_key, stat, settings.OVERVIEW_STATS_CACHE_CLOSED)
+        else:
+            cache.set(cache_key, stat, settings.OVERVIEW_STATS_CACHE_CURRENT)
+    return stat
+
+
+def count_steps(model, date_start, date_end, step, steps):
+    """
+    Count model items in each step
+    """
+    if can_use_rollups(model, date_start, date_end, step):
+        return count_in_rollups(model, date_start, date_end, step, steps)
+    queryset = model.objects.filter_overview(date_start, date_end)
+    if settings.DATABASES['default']['ENGINE'] in BUCKET_SQL:
+        return count_in_database(model, queryset, date_end, step, steps)
+    return count_in_python(model, queryset, date_end, step, steps)
+
+
+def iterate_items(model, date_start, date_end, step, chunk_size=100):
+    """
+    Yield start date and number of model items for each step between dates
+    Steps are counted in windows of chunk_size steps, so any range can be walked in constant memory
+    """
+    window_start = date_start
+    while window_start < date_end:
+        # Items dated exactly on window's start were counted in previous window
+        count_start = window_start if window_start == date_start else window_start + timedelta(microseconds=1)
+        window_steps = min(chunk_size, int((date_end - window_start).total_seconds()) // step)
+        if not window_steps:
+            # Last step is shorter than others, end it on end date so later items are not counted
+            yield window_start, count_items(model, count_start, date_end, step, 2)[0]
+            break
+        window_end = window_start + timedelta(seconds=window_steps * step)
+        stat = count_items(model, count_start, window_end, step, window_steps + 1)
+        for i in range(0, window_steps):
+            yield window_start + timedelta(seconds=i * step), stat[i]
+        window_start = window_end
\ No newline at end of file
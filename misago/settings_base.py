@@ -7,6 +7,34 @@ BOARD_ADDRESS = 'http://127.0.0.1:8000/'
 # Leave this setting empty
 ADMIN_PATH = ''
 
+# Admin lists with more items than this number display count estimated by database
+# instead of counting items. Estimates are available only on PostgreSQL.
+# Set to zero to always count items.
+ADMIN_COUNT_ESTIMATE_THRESHOLD = 0
+
+# Number of seconds for which admin lists items counts are cached.
+ADMIN_COUNT_CACHE_TIME = 3600
+
+# Number of seconds for which statistics graphs are cached.
+# Graphs ending in past change only when items are deleted, so they are kept longer
+# than graphs reaching present time.
+OVERVIEW_STATS_CACHE_CLOSED = 2592000
+OVERVIEW_STATS_CACHE_CURRENT = 60
+
+# Function used to fetch Gravatars, fetched Gravatars are stored in MEDIA_ROOT.
+# Point fetcher to your own function taking e-mail hash and size to work without network.
+# Stored Gravatars never change contents, so make web server send far future Expires
+# for MEDIA_URL/avatars/gravatar/. Gravatars are fetched again after refresh time (in seconds).
+AVATAR_FETCHER = 'misago.users.gravatar.fetch_gravatar'
+AVATAR_FETCH_TIMEOUT = 3
+AVATAR_GRAVATAR_REFRESH = 604800
+
+# Uploaded avatars limits (size in KB and width or height in pixels)
+# and number of threads resizing them.
+AVATAR_UPLOAD_LIMIT = 512
+AVATAR_UPLOAD_DIMENSIONS = 2000
+AVATAR_UPLOAD_WORKERS = 2
+
 # If you set this to False, Django will make some optimizations so as not
 # to load the internationalization machinery.
 USE_I18N = True
@@ -28,6 +56,20 @@ LOCALE_PATHS = (
 # If DEBUG_MODE is on, all emails will be sent to this address instead of real recipient.
 CATCH_ALL_EMAIL_ADDRESS = ''
 
+# E-mails are sent during request. Set MAILING_QUEUE to True to save them in
+# queue instead, but only when sendqueuedmail command runs from CRON or with
+# --loop option, otherwise no e-mails will be sent.
+# MAILING_BACKEND overrides EMAIL_BACKEND for queue worker, set it to
+# 'django.core.mail.backends.console.EmailBackend' or
+# 'django.core.mail.backends.filebased.EmailBackend' for testing.
+# Messages that failed MAILING_MAX_ATTEMPTS times are logged to misago.mailing and deleted.
+MAILING_QUEUE = False
+MAILING_BACKEND = None
+MAILING_MAX_ATTEMPTS = 5
+
+# Number of connections newsletters are sent over at same time.
+NEWSLETTERS_CONNECTIONS = 2
+
 # List of finder classes that know how to find static files in
 # various locations.
 STATICFILES_FINDERS = (
@@ -65,6 +107,7 @@ JINJA2_EXTENSIONS = (
 )
 
 # List of application middlewares
+# Middlewares reading response content (eg. GZip or ETags) keep streamed stats exports in memory
 MIDDLEWARE_CLASSES = (
     # Uncomment the next line for simple stopwatch
     # Measured times will be logged in "stopwatch.txt"
@@ -84,6 +127,7 @@ MIDDLEWARE_CLASSES = (
     'misago.messages.middleware.MessagesMiddleware',
     'misago.users.middleware.UserMiddleware',
     'misago.acl.middleware.ACLMiddleware',
+    'misago.forums.middleware.CountersMiddleware',
     'django.middleware.common.CommonMiddleware',
 )
 
@@ -103,12 +147,14 @@ INSTALLED_APPS = (
     'misago.settings', # Database level application configuration
     'misago.monitor', # Forum statistics monitor
     'misago.utils', # Utility classes
+    'misago.admin', # Admin control panel
     # Applications with dependencies
     'misago.acl', # Web crawlers handling
     'misago.banning', # Banning and blacklisting users
     'misago.crawlers', # Web crawlers handling
     'misago.cookie_jar', # Cookies helper
     'misago.forums', # Forums, threads and posts
+    'misago.mailing', # Outgoing e-mails queue
     'misago.messages', # Messages and Flashes
     'misago.overview', # Admin system overview
     'misago.security', # Security: CSRF, Firewall, etc ect
@@ -166,6 +212,10 @@ LOGGING = {
             'level': 'ERROR',
             'filters': ['require_debug_false'],
             'class': 'django.utils.log.AdminEmailHandler'
+        },
+        'console': {
+            'level': 'ERROR',
+            'class': 'logging.StreamHandler'
         }
     },
     'loggers': {
@@ -174,5 +224,10 @@ LOGGING = {
             'level': 'ERROR',
             'propagate': True,
         },
+        'misago.mailing': {
+            'handlers': ['console'],
+            'level': 'ERROR',
+            'propagate': True,
+        },
     }
 }
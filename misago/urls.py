@@ -7,6 +7,7 @@ from misago.admin import ADMIN_PATH, site
 urlpatterns = patterns('',
     (r'^', include('misago.security.urls')),
     (r'^', include('misago.users.urls')),
+    (r'^', include('misago.forums.urls')),
     url(r'^$', 'misago.views.home', name="index"),
 )
 
@@ -18,8 +19,8 @@ if ADMIN_PATH:
     
 # Include static and media patterns in DEBUG
 if settings.DEBUG:
-    urlpatterns += patterns('django.views.static',
-        (r'media/(?P<path>.*)', 'serve', {'document_root': settings.MEDIA_ROOT}),
+    urlpatterns += patterns('misago.views',
+        (r'media/(?P<path>.*)', 'serve_media', {'document_root': settings.MEDIA_ROOT}),
     )
 
 # Set error handlers
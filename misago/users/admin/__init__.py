@@ -2,7 +2,7 @@ from django.conf.urls import patterns, include, url
 from django.utils.translation import ugettext_lazy as _
 from misago.admin import AdminSection, AdminAction
 from misago.banning.models import Ban
-from misago.users.models import User, Rank
+from misago.users.models import User, Rank, Newsletter
 
 ADMIN_SECTIONS=(
     AdminSection(
@@ -115,8 +115,9 @@ ADMIN_ACTIONS=(
                help=_("Delete multiple Users"),
                icon='remove',
                route='admin_users_prune',
-               urlpatterns=patterns('misago.admin.views',
-                        url(r'^$', 'todo', name='admin_users_prune'),
+               model=User,
+               urlpatterns=patterns('misago.users.admin.prune.views',
+                        url(r'^$', 'Prune', name='admin_users_prune'),
                     ),
                ),
    AdminAction(
@@ -125,9 +126,32 @@ ADMIN_ACTIONS=(
                name=_("Newsletters"),
                help=_("Manage and send Newsletters"),
                icon='envelope',
+               model=Newsletter,
+               actions=[
+                        {
+                         'id': 'list',
+                         'icon': 'list-alt',
+                         'name': _("Browse Newsletters"),
+                         'help': _("Browse all existing newsletters"),
+                         'route': 'admin_users_newsletters'
+                         },
+                        {
+                         'id': 'new',
+                         'icon': 'plus',
+                         'name': _("New Newsletter"),
+                         'help': _("Create new newsletter"),
+                         'route': 'admin_users_newsletters_new'
+                         },
+                        ],
                route='admin_users_newsletters',
-               urlpatterns=patterns('misago.admin.views',
-                        url(r'^$', 'todo', name='admin_users_newsletters'),
+               urlpatterns=patterns('misago.users.admin.newsletters.views',
+                        url(r'^$', 'List', name='admin_users_newsletters'),
+                        url(r'^(?P<page>\d+)/$', 'List', name='admin_users_newsletters'),
+                        url(r'^new/$', 'New', name='admin_users_newsletters_new'),
+                        url(r'^edit/(?P<slug>([a-z0-9]|-)+)-(?P<target>\d+)/$', 'Edit', name='admin_users_newsletters_edit'),
+                        url(r'^send/(?P<slug>([a-z0-9]|-)+)-(?P<target>\d+)/$', 'Send', name='admin_users_newsletters_send'),
+                        url(r'^stop/(?P<slug>([a-z0-9]|-)+)-(?P<target>\d+)/$', 'Stop', name='admin_users_newsletters_stop'),
+                        url(r'^delete/(?P<slug>([a-z0-9]|-)+)-(?P<target>\d+)/$', 'Delete', name='admin_users_newsletters_delete'),
                     ),
                ),
 )
\ No newline at end of file
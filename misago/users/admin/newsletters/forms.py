@@ -0,0 +1,31 @@
+from django.utils.translation import ugettext_lazy as _
+from django import forms
+from misago.forms import Form
+from misago.users.models import Rank
+
+class NewsletterForm(Form):
+    name = forms.CharField(max_length=255)
+    content_html = forms.CharField(widget=forms.Textarea)
+    content_plain = forms.CharField(widget=forms.Textarea)
+    ranks = forms.ModelMultipleChoiceField(widget=forms.CheckboxSelectMultiple,queryset=Rank.objects.order_by('name').all(),required=False)
+    step_size = forms.IntegerField(initial=100,min_value=1)
+    rate_limit = forms.IntegerField(initial=0,min_value=0)
+    
+    layout = (
+              (
+               _("Newsletter"),
+               (
+                ('name', {'label': _("Newsletter Title"), 'help_text': _("Title is used as subject of sent e-mails.")}),
+                ('content_html', {'label': _("HTML Message"), 'help_text': _("Message sent to members in HTML e-mails. Write {username} or {email} in place of member's name or e-mail address.")}),
+                ('content_plain', {'label': _("Plain Text Message"), 'help_text': _("Message sent to members in plain text e-mails. Write {username} or {email} in place of member's name or e-mail address.")}),
+               )
+              ),
+              (
+               _("Delivery"),
+               (
+                ('ranks', {'label': _("Limit to Ranks"), 'help_text': _("Send newsletter only to members with selected ranks. Leave empty to send it to all active members.")}),
+                ('step_size', {'label': _("Step Size"), 'help_text': _("Number of members newsletter is sent to in one step. Progress is saved after each step.")}),
+                ('rate_limit', {'label': _("Rate Limit"), 'help_text': _("Maximum number of e-mails sent in one minute. Enter 0 to send newsletter as fast as possible.")}),
+               )
+              ),
+             )
\ No newline at end of file
@@ -0,0 +1,151 @@
+from django.core.urlresolvers import reverse as django_reverse
+from django.utils.translation import ugettext as _
+from misago.admin import site
+from misago.admin.widgets import *
+from misago.utils import slugify
+from misago.users.admin.newsletters.forms import NewsletterForm
+from misago.users.models import Newsletter
+
+def reverse(route, target=None):
+    if target:
+        return django_reverse(route, kwargs={'target': target.pk, 'slug': slugify(target.name)})
+    return django_reverse(route)
+
+"""
+Views
+"""
+class List(ListWidget):
+    """
+    List Newsletters
+    """
+    admin = site.get_action('newsletters')
+    id = 'list'
+    columns=(
+             ('name', _("Newsletter")),
+             )
+    pagination = 20
+    nothing_checked_message = _('You have to check at least one newsletter.')
+    actions=(
+             ('delete', _("Delete selected"), _("Are you sure you want to delete selected newsletters?")),
+             )
+    
+    def sort_items(self, request, page_items, sorting_method):
+        return page_items.order_by('-id')
+    
+    def get_item_actions(self, request, item):
+        if item.status == Newsletter.STATUS_SENDING:
+            send_action = self.action('pause', _("Stop Sending"), reverse('admin_users_newsletters_stop', item), post=True)
+        else:
+            send_action = self.action('envelope', _("Send Newsletter"), reverse('admin_users_newsletters_send', item), post=True, prompt=_("Are you sure you want to send this newsletter?"))
+        return (
+                send_action,
+                self.action('pencil', _("Edit Newsletter"), reverse('admin_users_newsletters_edit', item)),
+                self.action('remove', _("Delete Newsletter"), reverse('admin_users_newsletters_delete', item), post=True, prompt=_("Are you sure you want to delete this newsletter?")),
+                )
+
+    def action_delete(self, request, items, checked):
+        Newsletter.objects.filter(id__in=checked).delete()
+        return BasicMessage(_('Selected newsletters have been deleted successfully.'), 'success'), reverse('admin_users_newsletters')
+
+
+class New(FormWidget):
+    admin = site.get_action('newsletters')
+    id = 'new'
+    fallback = 'admin_users_newsletters' 
+    form = NewsletterForm
+    submit_button = _("Save Newsletter")
+        
+    def get_new_url(self, request, model):
+        return reverse('admin_users_newsletters_new')
+    
+    def get_edit_url(self, request, model):
+        return reverse('admin_users_newsletters_edit', model)
+    
+    def submit_form(self, request, form, target):
+        new_newsletter = Newsletter(
+                                    name = form.cleaned_data['name'],
+                                    content_html = form.cleaned_data['content_html'],
+                                    content_plain = form.cleaned_data['content_plain'],
+                                    step_size = form.cleaned_data['step_size'],
+                                    rate_limit = form.cleaned_data['rate_limit'],
+                                   )
+        new_newsletter.save(force_insert=True)
+        for rank in form.cleaned_data['ranks']:
+            new_newsletter.ranks.add(rank)
+        return new_newsletter, BasicMessage(_('New Newsletter has been created.'), 'success')
+    
+   
+class Edit(FormWidget):
+    admin = site.get_action('newsletters')
+    id = 'edit'
+    name = _("Edit Newsletter")
+    fallback = 'admin_users_newsletters'
+    form = NewsletterForm
+    target_name = 'name'
+    notfound_message = _('Requested Newsletter could not be found.')
+    submit_fallback = True
+    
+    def get_url(self, request, model):
+        return reverse('admin_users_newsletters_edit', model)
+    
+    def get_edit_url(self, request, model):
+        return self.get_url(request, model)
+    
+    def get_initial_data(self, request, model):
+        return {
+                'name': model.name,
+                'content_html': model.content_html,
+                'content_plain': model.content_plain,
+                'ranks': model.ranks.all(),
+                'step_size': model.step_size,
+                'rate_limit': model.rate_limit,
+                }
+    
+    def submit_form(self, request, form, target):
+        target.name = form.cleaned_data['name']
+        target.content_html = form.cleaned_data['content_html']
+        target.content_plain = form.cleaned_data['content_plain']
+        target.step_size = form.cleaned_data['step_size']
+        target.rate_limit = form.cleaned_data['rate_limit']
+        target.save(force_update=True)
+        target.ranks.clear()
+        for rank in form.cleaned_data['ranks']:
+            target.ranks.add(rank)
+        return target, BasicMessage(_('Changes in newsletter "%(name)s" have been saved.' % {'name': self.original_name}), 'success')
+
+
+class Delete(ButtonWidget):
+    admin = site.get_action('newsletters')
+    id = 'delete'
+    fallback = 'admin_users_newsletters'
+    notfound_message = _('Requested newsletter could not be found.')
+    
+    def action(self, request, target):
+        target.delete()
+        return BasicMessage(_('Newsletter "%(name)s" has been deleted.' % {'name': target.name}), 'success'), False
+
+
+class Send(ButtonWidget):
+    admin = site.get_action('newsletters')
+    id = 'send'
+    fallback = 'admin_users_newsletters'
+    notfound_message = _('Requested newsletter could not be found.')
+    
+    def action(self, request, target):
+        if target.status == Newsletter.STATUS_SENT or not target.started:
+            # Send newsletter from first member, otherwhise resume stopped delivery
+            target.start()
+        target.status = Newsletter.STATUS_SENDING
+        target.save(force_update=True)
+        return BasicMessage(_('Newsletter "%(name)s" will be sent to %(total)s members.' % {'name': target.name, 'total': target.total - target.sent}), 'success'), False
+
+
+class Stop(ButtonWidget):
+    admin = site.get_action('newsletters')
+    id = 'stop'
+    fallback = 'admin_users_newsletters'
+    notfound_message = _('Requested newsletter could not be found.')
+    
+    def action(self, request, target):
+        Newsletter.objects.filter(pk=target.pk).update(status=Newsletter.STATUS_DRAFT)
+        return BasicMessage(_('Delivery of newsletter "%(name)s" has been stopped after %(sent)s members.' % {'name': target.name, 'sent': target.sent}), 'success'), False
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django.utils.translation import ugettext_lazy as _
+from django import forms
+from misago.forms import Form, YesNoSwitch
+
+class PruneUsersForm(Form):
+    registered_days = forms.IntegerField(min_value=0,initial=0)
+    last_visit_days = forms.IntegerField(min_value=0,initial=0)
+    inactive_only = forms.BooleanField(widget=YesNoSwitch,required=False)
+    no_posts = forms.BooleanField(widget=YesNoSwitch,required=False,initial=True)
+    
+    layout = (
+              (
+               _("Prune Criteria"),
+               (
+                ('registered_days', {'label': _("Registered Before"), 'help_text': _("Delete only users that have registered more than this number of days ago. Enter 0 to ignore registration date.")}),
+                ('last_visit_days', {'label': _("Last Visit Before"), 'help_text': _("Delete only users that have not visited forums for more than this number of days. Enter 0 to ignore last visit date.")}),
+                ('inactive_only', {'label': _("Inactive Only"), 'help_text': _("Delete only users that have not activated their accounts.")}),
+                ('no_posts', {'label': _("Without Posts Only"), 'help_text': _("Delete only users that have no posts. Posts of deleted users are kept, but they lose their author.")}),
+               )
+              ),
+             )
\ No newline at end of file
@@ -0,0 +1,38 @@
+from django.core.urlresolvers import reverse
+from django.utils.translation import ugettext as _
+from misago.admin import site
+from misago.admin.bulk import start_bulk_action
+from misago.admin.widgets import *
+from misago.users.admin.prune.forms import PruneUsersForm
+from misago.users.pruning import get_prune_queryset, prune_users, prune_finished
+
+"""
+Views
+"""
+class Prune(FormWidget):
+    admin = site.get_action('prune')
+    id = 'prune'
+    fallback = 'admin_users_prune'
+    form = PruneUsersForm
+    submit_button = _("Prune Users")
+    job = None
+    
+    def get_submit_url(self, request, model):
+        if self.job:
+            return '%s?bulk=%s' % (reverse('admin_users'), self.job)
+        return reverse('admin_users_prune')
+    
+    def submit_form(self, request, form, target):
+        if not (form.cleaned_data['registered_days'] or form.cleaned_data['last_visit_days']
+                or form.cleaned_data['inactive_only'] or form.cleaned_data['no_posts']):
+            return None, BasicMessage(_('You have to set at least one prune criteria.'), 'error')
+        users = get_prune_queryset(
+                                   form.cleaned_data['registered_days'],
+                                   form.cleaned_data['last_visit_days'],
+                                   form.cleaned_data['inactive_only'],
+                                   form.cleaned_data['no_posts'],
+                                   ).exclude(pk=request.user.pk)
+        if not users.exists():
+            return None, BasicMessage(_('No users match prune criteria.'), 'info')
+        self.job = start_bulk_action(_('Prune Users'), users, prune_users, prune_finished, 100)
+        return None, BasicMessage(_('Users pruning has been started.'), 'success')
\ No newline at end of file
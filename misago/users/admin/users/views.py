@@ -1,16 +1,39 @@
 from django.core.urlresolvers import reverse as django_reverse
+from django.utils import timezone
 from django.utils.translation import ugettext as _
 from misago.admin import site
 from misago.admin.widgets import *
+from misago.monitor.monitor import Monitor
 from misago.utils import slugify
 from misago.users.admin.users.forms import UserForm, SearchUsersForm
-from misago.users.models import User
+from misago.users.directory import invalidate_directory
+from misago.users.models import User, UserNgram
 
 def reverse(route, target=None):
     if target:
         return django_reverse(route, kwargs={'target': target.pk, 'slug': target.username_slug})
     return django_reverse(route)
 
+"""
+Bulk actions
+"""
+def remove_avatars(users):
+    for user in users:
+        user.delete_avatar()
+    User.objects.filter(id__in=[user.pk for user in users]).update(avatar_type='gravatar', avatar_image=None, profile_date=timezone.now())
+
+
+def delete_users(users):
+    for user in users:
+        user.delete_avatar()
+    User.objects.filter(id__in=[user.pk for user in users]).delete()
+
+
+def delete_users_finished():
+    User.objects.resync_monitor(Monitor())
+    invalidate_directory()
+
+
 """
 Views
 """
@@ -27,6 +50,7 @@ class List(ListWidget):
                'join_date': 0,
               }
     pagination = 25
+    keyset_pagination = True
     search_form = SearchUsersForm
     nothing_checked_message = _('You have to check at least one user.')
     actions=(
@@ -34,6 +58,10 @@ class List(ListWidget):
              ('remove_avs', _("Remove avatars"), _("Are you sure you want to reset selected members passwords?")),
              ('delete', _("Delete selected"), _("Are you sure you want to delete selected users?")),
              )
+    bulk_actions=(
+             ('remove_avs', _("Remove avatars"), _("Are you sure you want to remove avatars of all users matching search criteria?")),
+             ('delete', _("Delete users"), _("Are you sure you want to delete all users matching search criteria?")),
+             )
     
     def set_filters(self, model, filters):
         if 'role' in filters:
@@ -41,9 +69,9 @@ class List(ListWidget):
         if 'rank' in filters:
             model = model.filter(rank__in=filters['rank'])
         if 'username' in filters:
-            model = model.filter(username_slug__contains=filters['username'])
+            model = UserNgram.objects.filter_users(model, 'username', filters['username'])
         if 'email' in filters:
-            model = model.filter(email__contains=filters['email'])
+            model = UserNgram.objects.filter_users(model, 'email', filters['email'])
         if 'activation' in filters:
             model = model.filter(activation__in=filters['activation'])
         return model
@@ -67,8 +95,24 @@ class List(ListWidget):
                 
         User.objects.filter(id__in=checked).delete()
         User.objects.resync_monitor(request.monitor)
+        invalidate_directory()
         return BasicMessage(_('Selected users have been deleted successfully.'), 'success'), reverse('admin_users')
     
+    def action_remove_avs(self, request, items, checked):
+        remove_avatars(User.objects.filter(id__in=checked))
+        invalidate_directory()
+        return BasicMessage(_('Selected users avatars have been removed.'), 'success'), reverse('admin_users')
+    
+    def get_bulk_queryset(self, request, action, items):
+        if action == 'delete':
+            return items.exclude(pk=request.user.pk).exclude(roles__protected=True)
+        return items
+    
+    bulk_remove_avs = staticmethod(remove_avatars)
+    bulk_finished_remove_avs = staticmethod(invalidate_directory)
+    bulk_delete = staticmethod(delete_users)
+    bulk_finished_delete = staticmethod(delete_users_finished)
+    
 
 class Edit(FormWidget):
     admin = site.get_action('users')
@@ -117,6 +161,7 @@ class Edit(FormWidget):
                 target.roles.add(role)
         
         target.save(force_update=True)
+        invalidate_directory()
         return target, BasicMessage(_('Changes in user\'s "%(name)s" account have been saved.' % {'name': self.original_name}), 'success')
 
 
@@ -0,0 +1,75 @@
+from random import choice
+from django.conf import settings
+from path import path
+
+"""
+Avatars galleries index
+
+Galleries are scanned once per process and kept as tuples of images paths.
+Index is scanned again when modification time of avatars directory or any
+gallery changes, which happens when images are added to it or removed.
+"""
+AVATAR_EXTENSIONS = ('*.gif', '*.jpg', '*.jpeg', '*.png')
+
+AVATAR_SIZES = {
+                'big': 150,
+                'normal': 100,
+                'small': 64,
+                'tiny': 46,
+                }
+
+_index = {'mtimes': None, 'galleries': {}}
+
+
+def get_avatars_dir():
+    return path(settings.STATICFILES_DIRS[0]).joinpath('avatars')
+
+
+def get_mtimes():
+    """
+    Return modification times of avatars directory and galleries in it
+    """
+    avatars_dir = get_avatars_dir()
+    mtimes = [('', avatars_dir.mtime)]
+    for directory in avatars_dir.dirs():
+        mtimes.append((directory.name, directory.mtime))
+    return tuple(sorted(mtimes))
+
+
+def scan_galleries():
+    galleries = {}
+    for directory in get_avatars_dir().dirs():
+        images = []
+        for extension in AVATAR_EXTENSIONS:
+            images += ['/'.join(image.splitall()[-2:]) for image in directory.files(extension)]
+        galleries[directory.name] = tuple(sorted(images))
+    return galleries
+
+
+def get_galleries():
+    """
+    Return dict of galleries names and tuples of their images
+    """
+    try:
+        mtimes = get_mtimes()
+    except OSError:
+        return {}
+    if _index['mtimes'] != mtimes:
+        _index['galleries'] = scan_galleries()
+        _index['mtimes'] = mtimes
+    return _index['galleries']
+
+
+def get_random_avatar():
+    """
+    Pick random image from default gallery, or from all galleries if default one is empty
+    """
+    galleries = get_galleries()
+    images = galleries.get('_default')
+    if not images:
+        images = []
+        for gallery in galleries.values():
+            images += gallery
+    if images:
+        return choice(images)
+    return None
\ No newline at end of file
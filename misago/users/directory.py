@@ -0,0 +1,72 @@
+import hashlib
+from django.core.cache import cache
+from django.utils import translation
+from misago.users.models import User
+from misago.utils.versions import get_version, bump_version
+
+"""
+Members directory
+
+Members of rank tabs are listed in pages ordered by username slug, and pages
+are sliced by keyset (after/before slug) instead of offset. Rendered pages are
+cached until directory version changes, which happens whenever users ranks change.
+"""
+PAGE_SIZE = 24
+PAGE_CACHE_TIME = 300
+
+
+def get_directory_version():
+    return get_version('misago.users.directory')
+
+
+def invalidate_directory():
+    """
+    Forget all cached directory pages.
+    Call it after changing users ranks, adding users or deleting them.
+    """
+    bump_version('misago.users.directory')
+
+
+def get_page(rank, after=None, before=None):
+    """
+    Return list of rank members and cursors for previous and next page
+    """
+    users = User.objects.filter(rank=rank).only('id', 'username', 'username_slug', 'email', 'email_hash', 'avatar_type', 'avatar_image',
+                                                'gravatar_image', 'gravatar_date', 'title')
+    if before:
+        users = [user for user in users.filter(username_slug__lt=before).order_by('-username_slug')[:PAGE_SIZE + 1]]
+        users.reverse()
+        has_prev = len(users) > PAGE_SIZE
+        users = users[-PAGE_SIZE:]
+        has_next = True
+    else:
+        if after:
+            users = users.filter(username_slug__gt=after)
+        users = [user for user in users.order_by('username_slug')[:PAGE_SIZE + 1]]
+        has_next = len(users) > PAGE_SIZE
+        users = users[:PAGE_SIZE]
+        has_prev = bool(after)
+    
+    if not users:
+        return users, None, None
+    return users, users[0].username_slug if has_prev else None, users[-1].username_slug if has_next else None
+
+
+def render_page(request, rank, after=None, before=None):
+    """
+    Return dict with rendered page of rank members and pagination cursors
+    """
+    cache_key = 'misago.users.directory.%s.%s' % (get_directory_version(), hashlib.md5((u'%s:%s:%s:%s:%s' % (
+                                                  rank.pk, request.theme.get_theme(), translation.get_language(),
+                                                  after or '', before or '')).encode('utf-8')).hexdigest())
+    page = cache.get(cache_key)
+    if page is None:
+        users, prev, next = get_page(rank, after, before)
+        page = {
+                'users': len(users),
+                'prev': prev,
+                'next': next,
+                'html': request.theme.render_to_string('users/list_table.html', {'users': users, 'in_search': False}) if users else '',
+                }
+        cache.set(cache_key, page, PAGE_CACHE_TIME)
+    return page
\ No newline at end of file
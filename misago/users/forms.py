@@ -5,6 +5,7 @@ from django.utils.translation import ugettext_lazy as _
 from misago.forms import Form
 from misago.security import captcha
 from misago.users.models import User
+from misago.users.uploads import validate_avatar
 from misago.users.validators import validate_password, validate_email
 
 
@@ -102,6 +103,21 @@ class UserSendSpecialMailForm(Form):
         return email
     
     
+class UploadAvatarForm(Form):
+    avatar = forms.FileField()
+    
+    layout = [
+              (
+               None,
+               [('avatar', {'label': _('Avatar Image'), 'help_text': _("Select GIF, JPEG or PNG image you want to use as your avatar.")})]
+               ),
+              ]
+    
+    def clean_avatar(self):
+        validate_avatar(self.cleaned_data['avatar'])
+        return self.cleaned_data['avatar']
+    
+    
 class QuickFindUserForm(Form):
     username = forms.CharField()
     
\ No newline at end of file
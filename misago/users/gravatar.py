@@ -0,0 +1,103 @@
+import hashlib
+import os
+import tempfile
+import urllib2
+from datetime import timedelta
+from StringIO import StringIO
+from django.conf import settings
+from django.utils import timezone
+from django.utils.importlib import import_module
+from misago.users.avatars import AVATAR_SIZES
+from path import path
+use_pil = True
+try:
+    from PIL import Image
+except ImportError:
+    use_pil = False
+
+"""
+Local Gravatars cache
+
+Gravatars are fetched by fetcher set in AVATAR_FETCHER setting, resized to all avatar
+sizes and stored in MEDIA_ROOT, so web server can serve them without asking Misago.
+Stored files are named after email hash and hash of their contents, so their URLs never
+change contents and can be cached by browsers for good. Name of stored gravatar and date
+it was fetched on are kept by user, and gravatar is fetched again once it gets older than
+AVATAR_GRAVATAR_REFRESH. Gravatars are fetched only for email hashes of existing users.
+If PIL is not available, each size is fetched separately.
+"""
+def fetch_gravatar(email_hash, size):
+    """
+    Default avatars fetcher, downloads avatar from Gravatar
+    """
+    return urllib2.urlopen('https://secure.gravatar.com/avatar/%s?s=%s' % (email_hash, size),
+                           timeout=settings.AVATAR_FETCH_TIMEOUT).read()
+
+
+def get_fetcher():
+    module, function = settings.AVATAR_FETCHER.rsplit('.', 1)
+    return getattr(import_module(module), function)
+
+
+def get_gravatars_dir():
+    return path(settings.MEDIA_ROOT).joinpath('avatars').joinpath('gravatar')
+
+
+def get_gravatar_filename(image, size):
+    return '%s-%s.png' % (image, size)
+
+
+def get_gravatar_url(image, size):
+    return '%savatars/gravatar/%s' % (settings.MEDIA_URL, get_gravatar_filename(image, size))
+
+
+def is_gravatar_fresh(date):
+    return bool(date) and date > timezone.now() - timedelta(seconds=settings.AVATAR_GRAVATAR_REFRESH)
+
+
+def resize_image(data, size):
+    image = Image.open(StringIO(data))
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    image = image.resize((size, size), Image.ANTIALIAS)
+    output = StringIO()
+    image.save(output, 'PNG')
+    return output.getvalue()
+
+
+def store_image(filename, data):
+    target = get_gravatars_dir().joinpath(filename)
+    if not target.parent.exists():
+        target.parent.makedirs()
+    handle, temp = tempfile.mkstemp(prefix='.%s.' % filename, dir=target.parent)
+    try:
+        os.write(handle, data)
+    finally:
+        os.close(handle)
+    os.chmod(temp, 0644)
+    os.rename(temp, target)
+
+
+def store_gravatar(email_hash):
+    """
+    Fetch avatar in all sizes and store it, returning its image name
+    Raises IOError if avatar cant be fetched
+    """
+    fetcher = get_fetcher()
+    if use_pil:
+        source = fetcher(email_hash, max(AVATAR_SIZES.values()))
+        images = dict([(size_name, resize_image(source, size_px)) for size_name, size_px in AVATAR_SIZES.items()])
+    else:
+        images = dict([(size_name, fetcher(email_hash, size_px)) for size_name, size_px in AVATAR_SIZES.items()])
+    
+    image = '%s-%s' % (email_hash, hashlib.md5(''.join([images[size] for size in sorted(images.keys())])).hexdigest()[:8])
+    for size_name, data in images.items():
+        store_image(get_gravatar_filename(image, size_name), data)
+    return image
+
+
+def delete_gravatar(image):
+    for size_name in AVATAR_SIZES.keys():
+        avatar = get_gravatars_dir().joinpath(get_gravatar_filename(image, size_name))
+        if avatar.exists():
+            avatar.remove()
@@ -0,0 +1,157 @@
+import bisect
+import threading
+from django.core.cache import cache
+from django.db.models import Count
+from misago.users.models import User, UserNgram, get_ngrams
+from misago.utils import slugify
+from misago.utils.versions import get_version, bump_version
+
+"""
+Usernames lookup service
+
+Each process keeps sorted array of usernames slugs for prefix searches with bisect.
+Changes to usernames are recorded in shared cache log, and processes apply those
+to their arrays, loading whole array again only when they missed some changes.
+Without cache able to keep lookup version arrays would be loaded on every search,
+so prefixes are searched in database instead.
+Near matches are found by trigrams index and ordered by edit distance.
+"""
+CHANGES_LOG_LENGTH = 200
+
+_index = {'version': None, 'slugs': [], 'ids': []}
+_index_lock = threading.Lock()
+
+
+def get_lookup_version():
+    """
+    Return lookup version, or None if cache cant keep it
+    """
+    return get_version('misago.users.lookup')
+
+
+def record_change(pk, old_slug=None, new_slug=None):
+    """
+    Record change of user's username slug in changes log
+    """
+    # If version was lost, new one starts from current time and processes load their indexes again
+    version = bump_version('misago.users.lookup')
+    changes = cache.get('misago.users.lookup.changes') or []
+    changes.append((version, pk, old_slug, new_slug))
+    cache.set('misago.users.lookup.changes', changes[-CHANGES_LOG_LENGTH:])
+
+
+def load_index(version):
+    slugs = []
+    ids = []
+    for pk, slug in User.objects.order_by('username_slug').values_list('id', 'username_slug').iterator():
+        slugs.append(slug)
+        ids.append(pk)
+    _index['slugs'] = slugs
+    _index['ids'] = ids
+    _index['version'] = version
+
+
+def remove_slug(slug, pk):
+    i = bisect.bisect_left(_index['slugs'], slug)
+    if i < len(_index['slugs']) and _index['slugs'][i] == slug and _index['ids'][i] == pk:
+        del _index['slugs'][i]
+        del _index['ids'][i]
+
+
+def insert_slug(slug, pk):
+    i = bisect.bisect_left(_index['slugs'], slug)
+    _index['slugs'].insert(i, slug)
+    _index['ids'].insert(i, pk)
+
+
+def get_index(version):
+    """
+    Return up to date index, applying recorded changes to it
+    Call it only with index lock acquired
+    """
+    if _index['version'] == version:
+        return _index
+    if _index['version'] is None or _index['version'] > version or version - _index['version'] > CHANGES_LOG_LENGTH:
+        # Index is from other version line or too old for changes log to bring it up to date
+        load_index(version)
+        return _index
+    
+    changes = [change for change in (cache.get('misago.users.lookup.changes') or []) if change[0] > _index['version']]
+    changes.sort()
+    if [change[0] for change in changes] != range(_index['version'] + 1, version + 1):
+        # Some changes are not in log anymore
+        load_index(version)
+        return _index
+    for change_version, pk, old_slug, new_slug in changes:
+        if old_slug:
+            remove_slug(old_slug, pk)
+        if new_slug:
+            insert_slug(new_slug, pk)
+    _index['version'] = version
+    return _index
+
+
+def get_edit_distance(a, b):
+    """
+    Return Levenshtein distance between two strings
+    """
+    if len(a) < len(b):
+        a, b = b, a
+    previous = range(len(b) + 1)
+    for i, char_a in enumerate(a):
+        current = [i + 1]
+        for j, char_b in enumerate(b):
+            current.append(min(previous[j + 1] + 1, current[j] + 1, previous[j] + (char_a != char_b)))
+        previous = current
+    return previous[-1]
+
+
+def find_prefix(prefix, limit=10):
+    """
+    Return ids of users whose usernames start with prefix
+    """
+    version = get_lookup_version()
+    if version is None:
+        return [pk for pk in User.objects.filter(username_slug__startswith=prefix).order_by('username_slug').values_list('id', flat=True)[:limit]]
+    
+    with _index_lock:
+        index = get_index(version)
+        i = bisect.bisect_left(index['slugs'], prefix)
+        ids = []
+        while i < len(index['slugs']) and len(ids) < limit and index['slugs'][i].startswith(prefix):
+            ids.append(index['ids'][i])
+            i += 1
+    return ids
+
+
+def find_similar(slug, limit=10, candidates=100):
+    """
+    Return ids of users whose usernames are closest to slug
+    """
+    ngrams = get_ngrams(slug)
+    if not ngrams:
+        return []
+    matches = UserNgram.objects.filter(token__in=['u%s' % ngram for ngram in ngrams]).values('user').annotate(matched=Count('id')).order_by('-matched')[:candidates]
+    users = User.objects.filter(pk__in=[match['user'] for match in matches]).values_list('id', 'username_slug')
+    max_distance = max(2, len(slug) / 3)
+    ranking = []
+    for pk, username_slug in users:
+        distance = get_edit_distance(slug, username_slug)
+        if distance <= max_distance:
+            ranking.append((distance, username_slug, pk))
+    ranking.sort()
+    return [pk for distance, username_slug, pk in ranking[:limit]]
+
+
+def find_users(username, limit=10):
+    """
+    Return list of users with usernames starting with or similar to one searched
+    """
+    slug = slugify(username)
+    if not slug:
+        return []
+    ids = find_prefix(slug, limit)
+    if len(ids) < limit:
+        ids += [pk for pk in find_similar(slug, limit) if not pk in ids][:limit - len(ids)]
+    users = User.objects.in_bulk(ids)
+    return [users[pk] for pk in ids if pk in users]
\ No newline at end of file
@@ -0,0 +1,46 @@
+from django.core.management.base import BaseCommand, CommandError
+from optparse import make_option
+from misago.users.pruning import get_prune_queryset, prune
+
+class Command(BaseCommand):
+    """
+    This command is intended to work as CRON job fired of every few days to delete users matching prune criteria.
+    """
+    help = 'Deletes users matching prune criteria'
+    option_list = BaseCommand.option_list + (
+        make_option('--registered',
+            type='int',
+            dest='registered',
+            default=0,
+            help='Delete only users that have registered more than this number of days ago'),
+        make_option('--last-visit',
+            type='int',
+            dest='last_visit',
+            default=0,
+            help='Delete only users that have not visited forums for more than this number of days'),
+        make_option('--inactive-only',
+            action='store_true',
+            dest='inactive_only',
+            default=False,
+            help='Delete only users that have not activated their accounts'),
+        make_option('--no-posts',
+            action='store_true',
+            dest='no_posts',
+            default=False,
+            help='Delete only users that have no posts'),
+        make_option('--dry-run',
+            action='store_true',
+            dest='dry_run',
+            default=False,
+            help='Only count users matching prune criteria'),
+        )
+
+    def handle(self, *args, **options):
+        if not (options['registered'] or options['last_visit'] or options['inactive_only'] or options['no_posts']):
+            raise CommandError('pruneusers requires at least one prune criteria')
+        users = get_prune_queryset(options['registered'], options['last_visit'],
+                                   options['inactive_only'], options['no_posts'])
+        if options['dry_run']:
+            self.stdout.write('%s users match prune criteria.\n' % users.count())
+        else:
+            self.stdout.write('%s users have been pruned.\n' % prune(users))
\ No newline at end of file
@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand, CommandError
+from misago.users.models import User, UserNgram
+
+class Command(BaseCommand):
+    """
+    This command rebuilds users search index, run it after upgrading, after importing users or changing
+    their names and e-mails with raw queries or queryset updates, or when index gets out of sync
+    """
+    help = 'Rebuilds users search index'
+    def handle(self, *args, **options):
+        last_pk = 0
+        indexed = 0
+        while True:
+            users = [user for user in User.objects.filter(pk__gt=last_pk).order_by('pk')[:500]]
+            if not users:
+                break
+            for user in users:
+                UserNgram.objects.index_user(user)
+            last_pk = users[-1].pk
+            indexed += len(users)
+        self.stdout.write('Search index has been rebuilt for %s users.\n' % indexed)
\ No newline at end of file
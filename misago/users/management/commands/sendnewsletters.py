@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+from misago.users.newsletters import send_newsletters
+
+class Command(BaseCommand):
+    """
+    This command delivers newsletters admins have sent. Run it from CRON, stopped deliveries will resume where they ended.
+    """
+    help = 'Delivers newsletters'
+    def handle(self, *args, **options):
+        sent = send_newsletters()
+        self.stdout.write('%s newsletters have been delivered.\n' % sent)
\ No newline at end of file
@@ -1,9 +1,7 @@
-from django.core.exceptions import ValidationError, NON_FIELD_ERRORS
-from django.core.management.base import BaseCommand, CommandError
-from django.db.models import F
-from django.utils import timezone
-from optparse import make_option
-from misago.users.models import User, Rank
+from django.core.management.base import BaseCommand
+from misago.admin.counts import invalidate
+from misago.users.models import User
+from misago.users.ranking import update_ranking
 
 class Command(BaseCommand):
     """
@@ -11,26 +9,9 @@ class Command(BaseCommand):
     """
     help = 'Updates users ranking'
     def handle(self, *args, **options):
-        # Find special ranks
-        special_ranks = []
-        for rank in Rank.objects.filter(special=1):
-            special_ranks.append(str(rank.pk))
+        changed = update_ranking()
         
-        # Count users that are in ranking
-        users_total = User.objects.exclude(rank__in=special_ranks).count()
+        # Bulk updates dont send signals, so make admin lists recount users
+        invalidate(User)
         
-        # Update Ranking
-        defaulted_ranks = False
-        for rank in Rank.objects.filter(special=0).order_by('order'):
-            if defaulted_ranks:
-                # Set ranks according to ranking
-                rank.assign_rank(users_total, special_ranks)
-            else:
-                # Set default rank first
-                User.objects.exclude(rank__in=special_ranks).update(rank=rank)
-                defaulted_ranks = True
-        
-        # Inflate scores
-        User.objects.all().update(score=F('score') * 0.95) # TODO: Ranking system SETTINGS!
-        
-        self.stdout.write('Users ranking for has been updated.\n')
\ No newline at end of file
+        self.stdout.write('Users ranking has been updated, %s users have changed rank.\n' % changed)
\ No newline at end of file
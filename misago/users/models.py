@@ -1,22 +1,50 @@
+import calendar
 import hashlib
 import math
-from random import choice
 from django.conf import settings
 from django.contrib.auth.hashers import (
     check_password, make_password, is_password_usable, UNUSABLE_PASSWORD)
 from django.core.exceptions import ValidationError
-from django.core.mail import EmailMultiAlternatives
-from django.db import models, connection, transaction
+from django.core.urlresolvers import reverse
+from django.db import connection, models
 from django.template import RequestContext
 from django.utils import timezone as tz_util
 from django.utils.translation import ugettext_lazy as _
 from misago.acl.models import Role
+from misago.admin.counts import register as register_counts
+from misago.mailing.queue import queue_mail
 from misago.monitor.monitor import Monitor
 from misago.security import get_random_string
 from misago.settings.settings import Settings as DBSettings
+from misago.users.avatars import get_random_avatar
+from misago.users.gravatar import delete_gravatar, get_gravatar_url, is_gravatar_fresh
+from misago.users.uploads import delete_avatar_files, get_avatar_filename
 from misago.users.validators import validate_username, validate_password, validate_email
 from misago.utils import slugify
-from path import path
+
+"""
+Users scores decay by SCORE_DECAY every day. Instead of updating all scores every day,
+user keeps score together with number of day it was last decayed on, and score is decayed
+when it is read or changed.
+"""
+SCORE_DECAY = 0.95
+
+
+def get_score_epoch(date=None):
+    """
+    Return number of days since Unix epoch
+    """
+    date = date or tz_util.now()
+    return int(calendar.timegm(date.utctimetuple()) // 86400)
+
+
+def get_decayed_score(score, score_epoch, epoch=None):
+    if epoch is None:
+        epoch = get_score_epoch()
+    if not score_epoch or epoch <= score_epoch:
+        return score
+    return score * (SCORE_DECAY ** (epoch - score_epoch))
+
 
 class UserManager(models.Manager):
     """
@@ -32,10 +60,15 @@ class UserManager(models.Manager):
     def resync_monitor(self, monitor):
         monitor['users'] = self.count()
         monitor['users_inactive'] = self.filter(activation__gt=0).count()
-        last_user = self.latest('id')
-        monitor['last_user'] = last_user.pk
-        monitor['last_user_name'] = last_user.username
-        monitor['last_user_slug'] = last_user.username_slug
+        try:
+            last_user = self.latest('id')
+            monitor['last_user'] = last_user.pk
+            monitor['last_user_name'] = last_user.username
+            monitor['last_user_slug'] = last_user.username_slug
+        except User.DoesNotExist:
+            monitor['last_user'] = None
+            monitor['last_user_name'] = None
+            monitor['last_user_slug'] = None
     
     def create_user(self, username, email, password, timezone=False, ip='127.0.0.1', activation=0, request=False):
         token = ''
@@ -116,6 +149,8 @@ class User(models.Model):
     password_date = models.DateTimeField()
     avatar_type = models.CharField(max_length=10,null=True,blank=True)
     avatar_image = models.CharField(max_length=255,null=True,blank=True)
+    gravatar_image = models.CharField(max_length=255,null=True,blank=True)
+    gravatar_date = models.DateTimeField(null=True,blank=True)
     signature = models.TextField(null=True,blank=True)
     signature_preparsed = models.TextField(null=True,blank=True)
     join_date = models.DateTimeField()
@@ -134,6 +169,7 @@ class User(models.Model):
     followers = models.PositiveIntegerField(default=0)
     followers_delta = models.IntegerField(default=0)
     score = models.IntegerField(default=0,db_index=True)
+    score_epoch = models.IntegerField(default=get_score_epoch)
     rank = models.ForeignKey('Rank',null=True,blank=True,db_index=True,on_delete=models.SET_NULL)
     title = models.CharField(max_length=255,null=True,blank=True)
     last_post = models.DateTimeField(null=True,blank=True)
@@ -151,20 +187,27 @@ class User(models.Model):
     signature_ban_reason_admin = models.TextField(null=True,blank=True)
     signature_ban_expires = models.DateTimeField(null=True,blank=True)
     timezone = models.CharField(max_length=255,default='utc')
+    profile_date = models.DateTimeField(null=True,blank=True)
     roles = models.ManyToManyField(Role)
     acl_cache = models.TextField(null=True,blank=True)
     
     objects = UserManager()   
     
+    search_outdated = False
+    username_outdated = False
+    previous_username_slug = None
+    
     ACTIVATION_NONE = 0
     ACTIVATION_USER = 1
     ACTIVATION_ADMIN = 2
     ACTIVATION_CREDENTIALS = 3
     
     statistics_name = _('Users Registrations')
+    statistics_date = 'join_date'
         
-    def acl(self):
-        pass
+    def acl(self, request):
+        from misago.acl.builder import get_acl
+        return get_acl(request, self)
         
     def is_admin(self):
         if self.is_god():
@@ -194,48 +237,63 @@ class User(models.Model):
     
     def default_avatar(self, db_settings):
         if db_settings['default_avatar'] == 'gallery':
-            try:
-                avatars_list = []
-                try:
-                    # First try, _default path
-                    galleries = path(settings.STATICFILES_DIRS[0]).joinpath('avatars').joinpath('_default')
-                    avatars_list += galleries.files('*.gif')
-                    avatars_list += galleries.files('*.jpg')
-                    avatars_list += galleries.files('*.jpeg')
-                    avatars_list += galleries.files('*.png')
-                except Exception as e:
-                    pass
-                # Second try, all paths
-                if not avatars_list:
-                    avatars_list = []
-                    for directory in path(settings.STATICFILES_DIRS[0]).joinpath('avatars').dirs():
-                        avatars_list += directory.files('*.gif')
-                        avatars_list += directory.files('*.jpg')
-                        avatars_list += directory.files('*.jpeg')
-                        avatars_list += directory.files('*.png')
-                if avatars_list:
-                    # Pick random avatar from list
-                    self.avatar_type = 'gallery'
-                    self.avatar_image = '/'.join(path(choice(avatars_list)).splitall()[-2:])
-                    return True
-            except Exception as e:
-                pass
+            avatar = get_random_avatar()
+            if avatar:
+                self.avatar_type = 'gallery'
+                self.avatar_image = avatar
+                return True
         self.avatar_type = 'gravatar'
         self.avatar_image = None
         return True
 
     def delete_avatar(self):
-        if self.avatar_type == 'upload':
-            # DELETE OUR AVATAR!!!
-            pass
+        if self.avatar_type == 'upload' and self.avatar_image:
+            delete_avatar_files(self.avatar_image)
         
     def delete(self, *args, **kwargs):
+        from misago.users.directory import invalidate_directory
+        from misago.users.lookup import record_change
+        pk, username_slug = self.pk, self.username_slug
         self.delete_avatar()
         super(User, self).delete(*args, **kwargs)
+        invalidate_directory()
+        record_change(pk, old_slug=username_slug)
+        
+    def get_version(self):
+        """
+        Return user's profile version, time of last profile change in miliseconds
+        """
+        date = self.profile_date or self.join_date
+        return calendar.timegm(date.utctimetuple()) * 1000 + date.microsecond // 1000
+    
+    def update_version(self):
+        """
+        Mark user's profile as changed, new version is stored with next save
+        """
+        self.profile_date = tz_util.now()
+        
+    def save(self, *args, **kwargs):
+        if self.search_outdated:
+            self.update_version()
+        super(User, self).save(*args, **kwargs)
+        if self.search_outdated:
+            # New username or e-mail, update search index and members list
+            from misago.users.directory import invalidate_directory
+            UserNgram.objects.index_user(self)
+            invalidate_directory()
+            self.search_outdated = False
+        if self.username_outdated:
+            from misago.users.lookup import record_change
+            record_change(self.pk, self.previous_username_slug or None, self.username_slug)
+            self.username_outdated = False
             
     def set_username(self, username):
+        if not self.username_outdated:
+            self.username_outdated = True
+            self.previous_username_slug = self.username_slug
         self.username = username.strip()
         self.username_slug = slugify(username)
+        self.search_outdated = True
         
     def is_username_valid(self, e):
         try:
@@ -264,8 +322,14 @@ class User(models.Model):
             pass
         
     def set_email(self, email):
-        self.email = email.strip().lower()
+        email = email.strip().lower()
+        if self.gravatar_image and email != self.email:
+            delete_gravatar(self.gravatar_image)
+            self.gravatar_image = None
+            self.gravatar_date = None
+        self.email = email
         self.email_hash = hashlib.md5(self.email).hexdigest()
+        self.search_outdated = True
         
     def set_password(self, raw_password):
         self.password_date = tz_util.now()
@@ -306,22 +370,28 @@ class User(models.Model):
     def get_avatar(self, size='normal'):
         # Get uploaded avatar
         if self.avatar_type == 'upload':
-            return settings.MEDIA_URL + 'avatars/' + self.avatar_image
+            if not size in ('big', 'small', 'tiny'):
+                size = 'normal'
+            return settings.MEDIA_URL + 'avatars/' + get_avatar_filename(self.avatar_image, size)
         
         # Get gallery avatar
         if self.avatar_type == 'gallery':
             return settings.STATIC_URL + 'avatars/' + self.avatar_image
         
-        # No avatar found, get gravatar
-        if size == 'big':
-            size = 150;
-        elif size == 'small':
-            size = 64;
-        elif size == 'tiny':
-            size = 46;
-        else:
-            size = 100
-        return 'http://www.gravatar.com/avatar/%s?s=%s' % (hashlib.md5(self.email).hexdigest(), size)
+        # No avatar found, get gravatar from local cache or let view fetch it
+        if not size in ('big', 'small', 'tiny'):
+            size = 'normal'
+        if self.gravatar_image and is_gravatar_fresh(self.gravatar_date):
+            return get_gravatar_url(self.gravatar_image, size)
+        return reverse('gravatar', kwargs={'email_hash': self.email_hash, 'size': size})
+    
+    def get_score(self, epoch=None):
+        return int(get_decayed_score(self.score, self.score_epoch, epoch))
+    
+    def add_score(self, points):
+        epoch = get_score_epoch()
+        self.score = self.get_score(epoch) + points
+        self.score_epoch = epoch
     
     def get_title(self):
         if self.title:
@@ -342,10 +412,8 @@ class User(models.Model):
         else:
             recipient = self.email
             
-        # Build and send message
-        email = EmailMultiAlternatives(subject, templates[0].render(context), settings.EMAIL_HOST_USER, [recipient])
-        email.attach_alternative(templates[1].render(context), "text/html")
-        email.send()
+        # Build message and queue it for delivery
+        queue_mail(subject, recipient, templates[0].render(context), templates[1].render(context))
     
     def get_activation(self):
         activations = ['none', 'user', 'admin', 'credentials']
@@ -355,6 +423,65 @@ class User(models.Model):
         return self.join_date
         
         
+def get_ngrams(value):
+    """
+    Return set of trigrams found in string
+    """
+    return set([value[i:i + 3] for i in range(0, len(value) - 2)])
+
+
+class UserNgramManager(models.Manager):
+    """
+    User search index manager
+    """
+    fields = {
+              'username': ('u', 'username_slug'),
+              'email': ('e', 'email'),
+              }
+    
+    def index_user(self, user):
+        self.filter(user=user).delete()
+        tokens = []
+        for field, (prefix, attr) in self.fields.items():
+            for ngram in get_ngrams(getattr(user, attr).lower()):
+                tokens.append(UserNgram(user=user, token=prefix + ngram))
+        self.bulk_create(tokens)
+    
+    def filter_users(self, queryset, field, value):
+        """
+        Filter queryset to users whose username or e-mail contains value.
+        Values shorter than three characters cant use index and fall back to table scan.
+        Index is updated when user is saved, users changed in other ways need rebuildusersindex.
+        """
+        prefix, attr = self.fields[field]
+        if field == 'username':
+            value = slugify(value)
+        else:
+            value = value.strip().lower()
+        tokens = [prefix + ngram for ngram in get_ngrams(value)]
+        if tokens:
+            # Single index scan for all ngrams, users have to match every one of them
+            qn = connection.ops.quote_name
+            user_column = qn(self.model._meta.get_field('user').column)
+            queryset = queryset.extra(where=['%s.%s IN (SELECT %s FROM %s WHERE %s IN (%s) GROUP BY %s HAVING COUNT(*) = %%s)' % (
+                                                qn(User._meta.db_table), qn(User._meta.pk.column),
+                                                user_column, qn(self.model._meta.db_table), qn('token'),
+                                                ', '.join(['%s' for token in tokens]), user_column,
+                                                )], params=tokens + [len(tokens)])
+        return queryset.filter(**{'%s__contains' % attr: value})
+    
+    
+class UserNgram(models.Model):
+    """
+    Misago User search index
+    Trigrams of usernames and e-mails allowing substring searches to hit index
+    """
+    user = models.ForeignKey('User')
+    token = models.CharField(max_length=4,db_index=True)
+    
+    objects = UserNgramManager()
+        
+        
 class Guest(object):
     """
     Misago Guest dummy
@@ -410,73 +537,60 @@ class Rank(models.Model):
     def __unicode__(self):
         return unicode(_(self.name))
     
-    def assign_rank(self, users=0, special_ranks=None):
+    def get_users_limit(self, users=0):
+        """
+        Return number of top users that should have this rank, or None if rank cant be rolled in
+        """
         if not self.criteria or self.special or users == 0:
-            # Rank cant be rolled in
-            return False
-        
+            return None
         if self.criteria == "0":
-            # Just update all fellows
-            User.objects.exclude(rank__in=special_ranks).update(rank=self)
-        else:
-            # Count number of users to update
-            if self.criteria[-1] == '%':
-                criteria = int(self.criteria[0:-1])
-                criteria = int(math.ceil(float(users / 100.0)* criteria))
-            else:
-                criteria = int(self.criteria)
-            
-            # Join special ranks
-            if special_ranks:
-                special_ranks = ','.join(special_ranks)
-            
-            # Run raw query
-            cursor = connection.cursor()
-            try:
-                # Postgresql
-                if (settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql_psycopg2'
-                    or settings.DATABASES['default']['ENGINE'] == 'django.db.backends.postgresql'):
-                    if special_ranks:
-                        cursor.execute('''UPDATE users_user
-                            FROM (
-                                SELECT id
-                                FROM users_user
-                                WHERE rank_id NOT IN (%s)
-                                ORDER BY score DESC LIMIT %s
-                                ) AS updateable
-                            SET rank_id=%s
-                            WHERE id = updateable.id
-                            RETURNING *''' % (self.id, special_ranks, criteria))
-                    else:
-                        cursor.execute('''UPDATE users_user
-                            FROM (
-                                SELECT id
-                                FROM users_user
-                                ORDER BY score DESC LIMIT %s
-                                ) AS updateable
-                            SET rank_id=%s
-                            WHERE id = updateable.id
-                            RETURNING *''', [self.id, criteria])
-                        
-                # MySQL, SQLite and Oracle
-                if (settings.DATABASES['default']['ENGINE'] == 'django.db.backends.mysql'
-                    or settings.DATABASES['default']['ENGINE'] == 'django.db.backends.sqlite3'
-                    or settings.DATABASES['default']['ENGINE'] == 'django.db.backends.oracle'):
-                    if special_ranks:
-                        cursor.execute('''UPDATE users_user
-                            SET rank_id=%s
-                            WHERE rank_id NOT IN (%s)
-                            ORDER BY score DESC
-                            LIMIT %s''' % (self.id, special_ranks, criteria))
-                    else:
-                        cursor.execute('''UPDATE users_user
-                        SET rank_id=%s
-                        ORDER BY score DESC
-                        LIMIT %s''', [self.id, criteria])
-            except Exception as e:
-                print 'Error updating users ranking: %s' % e
-            transaction.commit_unless_managed()
-        return True
+            return users
+        if self.criteria[-1] == '%':
+            return int(math.ceil(float(users / 100.0) * int(self.criteria[0:-1])))
+        return int(self.criteria)
+    
+    
+class Newsletter(models.Model):
+    """
+    Misago Newsletter
+    Newsletters are delivered in chunks of users ordered by id, remembering last user they were sent to,
+    so their delivery can be resumed after it was stopped.
+    """
+    STATUS_DRAFT = 0
+    STATUS_SENDING = 1
+    STATUS_SENT = 2
+    
+    name = models.CharField(max_length=255)
+    content_html = models.TextField()
+    content_plain = models.TextField()
+    ranks = models.ManyToManyField('Rank',blank=True)
+    status = models.IntegerField(default=0)
+    step_size = models.PositiveIntegerField(default=100)
+    rate_limit = models.PositiveIntegerField(default=0)
+    progress = models.PositiveIntegerField(default=0)
+    progress_ahead = models.TextField(null=True,blank=True)
+    sent = models.PositiveIntegerField(default=0)
+    total = models.PositiveIntegerField(default=0)
+    started = models.DateTimeField(null=True,blank=True)
+    finished = models.DateTimeField(null=True,blank=True)
+    locked = models.DateTimeField(null=True,blank=True)
+    
+    def get_recipients(self):
+        recipients = User.objects.filter(activation=User.ACTIVATION_NONE)
+        ranks = [rank.pk for rank in self.ranks.all()]
+        if ranks:
+            recipients = recipients.filter(rank__in=ranks)
+        return recipients
+    
+    def start(self):
+        self.status = Newsletter.STATUS_SENDING
+        self.progress = 0
+        self.progress_ahead = None
+        self.sent = 0
+        self.total = self.get_recipients().count()
+        self.started = tz_util.now()
+        self.finished = None
+        self.locked = None
     
     
 class Follower(models.Model):
@@ -495,4 +609,8 @@ class Foe(models.Model):
     user = models.ForeignKey('User')
     target = models.ForeignKey('User',related_name='+')
     since = models.DateTimeField()
-    
\ No newline at end of file
+
+
+register_counts(User)
+register_counts(Rank)
+register_counts(Newsletter)
@@ -0,0 +1,215 @@
+import logging
+import socket
+import smtplib
+import time
+from datetime import timedelta
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.core.mail import EmailMultiAlternatives, get_connection
+from django.db.models import Q
+from django.utils import timezone, translation
+from django.utils.html import escape
+from misago.settings.settings import Settings as DBSettings
+from misago.themes.theme import Theme
+from misago.users.models import Newsletter
+
+"""
+Newsletters delivery engine
+
+Newsletter is rendered once for every theme and language, with tokens in place of
+recipient's data. For each recipient those tokens are replaced with his data.
+Recipients are processed in chunks ordered by id, and progress is saved to database
+after each chunk, so stopped delivery continues where it has ended.
+Each chunk is split into parts of consecutive recipients, and pool of connections sends
+those parts in parallel, retrying failed messages. Progress is moved to last recipient
+of parts that were sent completely, and recipients of later parts that were handled
+are remembered in progress_ahead, so they are skipped when chunk is sent again.
+Messages that cant be built or sent for reasons other than mail server errors are logged
+and skipped.
+
+Worker claims newsletter before sending it and renews its claim after each chunk and
+every minute of waiting for rate limit, so other workers leave it alone until claim expires.
+"""
+SEND_ATTEMPTS = 4
+logger = logging.getLogger('misago.mailing')
+LOCK_TIME = timedelta(minutes=15)
+TOKENS = {
+          'username': '{username}',
+          'email': '{email}',
+          }
+
+
+def render_newsletter(newsletter, theme, language):
+    """
+    Return tuple with plain text and html of newsletter with recipient tokens
+    """
+    translation.activate(language)
+    try:
+        templates = Theme(theme).get_email_templates('users/newsletter')
+        context = {
+                   'newsletter': newsletter,
+                   'user': TOKENS,
+                   'settings': DBSettings(),
+                   'board_address': settings.BOARD_ADDRESS,
+                   }
+        return templates[0].render(context), templates[1].render(context)
+    finally:
+        translation.deactivate()
+
+
+def personalize(text, user, html=False):
+    for attr, token in TOKENS.items():
+        value = getattr(user, attr)
+        text = text.replace(token, escape(value) if html else value)
+    return text
+
+
+def send_messages(args):
+    """
+    Send messages over connection, retrying failed ones with growing delays
+    Return list of flags telling if message was sent or skipped, for messages
+    handled before first message that couldnt be sent
+    """
+    connection, messages = args
+    handled = []
+    for message in messages:
+        for attempt in range(SEND_ATTEMPTS):
+            try:
+                # Opening connection that is already open does nothing
+                connection.open()
+                connection.send_messages([message])
+                handled.append(True)
+                break
+            except (smtplib.SMTPException, socket.error):
+                if attempt + 1 == SEND_ATTEMPTS:
+                    return handled
+                try:
+                    connection.close()
+                except Exception:
+                    pass
+                time.sleep(2 ** attempt)
+            except Exception as e:
+                # Message itself is broken, sending it again wont help
+                logger.error('Newsletter could not be sent to %s: %s', ', '.join(message.to), e)
+                handled.append(False)
+                break
+    return handled
+
+
+def lock_newsletter(newsletter):
+    """
+    Claim newsletter for delivery, returning False if other worker has claimed it
+    """
+    now = timezone.now()
+    return bool(Newsletter.objects.filter(pk=newsletter.pk, status=Newsletter.STATUS_SENDING)
+                                  .filter(Q(locked__isnull=True) | Q(locked__lt=now - LOCK_TIME))
+                                  .update(locked=now))
+
+
+def wait(newsletter, seconds):
+    """
+    Sleep for number of seconds, renewing claim on newsletter every minute
+    Return False if delivery has been stopped by admin
+    """
+    while True:
+        time.sleep(min(seconds, 60))
+        seconds -= 60
+        if not Newsletter.objects.filter(pk=newsletter.pk, status=Newsletter.STATUS_SENDING).update(locked=timezone.now()):
+            return False
+        if seconds <= 0:
+            return True
+
+
+def send_chunk(newsletter, rendered, connections, pool):
+    """
+    Send newsletter to next chunk of recipients
+    Return tuple with number of recipients in chunk, number of messages sent and flag telling
+    if all recipients were handled
+    """
+    recipients = [user for user in newsletter.get_recipients().filter(pk__gt=newsletter.progress)
+                                                                .order_by('pk')
+                                                                .only('id', 'username', 'email')[:newsletter.step_size]]
+    if not recipients:
+        return 0, 0, True
+    
+    handled = set([int(pk) for pk in (newsletter.progress_ahead or '').split(',') if pk])
+    pending = []
+    for user in recipients:
+        if user.pk in handled:
+            continue
+        if settings.DEBUG and settings.CATCH_ALL_EMAIL_ADDRESS:
+            recipient = settings.CATCH_ALL_EMAIL_ADDRESS
+        else:
+            recipient = user.email
+        email = EmailMultiAlternatives(newsletter.name, personalize(rendered[0], user), settings.EMAIL_HOST_USER, [recipient])
+        email.attach_alternative(personalize(rendered[1], user, True), "text/html")
+        pending.append((user.pk, email))
+    
+    part_size = max((len(pending) + len(connections) - 1) // len(connections), 1)
+    parts = [(connection, pending[i * part_size:(i + 1) * part_size]) for i, connection in enumerate(connections)]
+    results = pool.map(send_messages, [(connection, [email for pk, email in part]) for connection, part in parts])
+    sent = 0
+    for part_handled, (connection, part) in zip(results, parts):
+        sent += part_handled.count(True)
+        for pk, email in part[:len(part_handled)]:
+            handled.add(pk)
+    
+    # Move progress past recipients handled without gaps, remember ones handled after gap
+    done = 0
+    while done < len(recipients) and recipients[done].pk in handled:
+        done += 1
+    if done:
+        newsletter.progress = recipients[done - 1].pk
+    newsletter.progress_ahead = ','.join([str(pk) for pk in sorted(handled) if pk > newsletter.progress]) or None
+    newsletter.sent += sent
+    Newsletter.objects.filter(pk=newsletter.pk).update(progress=newsletter.progress, progress_ahead=newsletter.progress_ahead,
+                                                       sent=newsletter.sent, locked=timezone.now())
+    return len(recipients), sent, done == len(recipients)
+
+
+def send_newsletter(newsletter, connections_number=None):
+    """
+    Deliver newsletter to all recipients it was not sent to yet
+    Return True if newsletter was delivered, False if it was stopped or couldnt be sent
+    """
+    if not lock_newsletter(newsletter):
+        return False
+    connections_number = connections_number or settings.NEWSLETTERS_CONNECTIONS
+    # Users have no own themes or languages yet, so they all get newsletter in default ones
+    rendered = render_newsletter(newsletter, settings.INSTALLED_THEMES[0], settings.LANGUAGE_CODE)
+    connections = [get_connection(settings.MAILING_BACKEND) for i in range(0, connections_number)]
+    pool = ThreadPool(connections_number)
+    try:
+        while True:
+            chunk_start = time.time()
+            recipients, sent, completed = send_chunk(newsletter, rendered, connections, pool)
+            if not completed:
+                # Mail server is failing, leave rest for next run
+                return False
+            if not recipients:
+                break
+            # Dont send more than rate_limit messages per minute
+            delay = sent * 60.0 / newsletter.rate_limit - (time.time() - chunk_start) if newsletter.rate_limit else 0
+            if not wait(newsletter, max(delay, 0)):
+                # Delivery has been stopped by admin
+                return False
+    finally:
+        pool.close()
+        for connection in connections:
+            connection.close()
+        Newsletter.objects.filter(pk=newsletter.pk).update(locked=None)
+    
+    # Admin may have stopped delivery after last chunk
+    return bool(Newsletter.objects.filter(pk=newsletter.pk, status=Newsletter.STATUS_SENDING)
+                                  .update(status=Newsletter.STATUS_SENT, finished=timezone.now()))
+
+
+def send_newsletters():
+    """
+    Deliver all newsletters that are being sent
+    """
+    sent = 0
+    for newsletter in Newsletter.objects.filter(status=Newsletter.STATUS_SENDING).order_by('pk'):
+        if send_newsletter(newsletter):
+            sent += 1
+    return sent
\ No newline at end of file
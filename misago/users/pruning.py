@@ -0,0 +1,84 @@
+from datetime import timedelta
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+from misago.monitor.monitor import Monitor
+from misago.users.directory import invalidate_directory
+from misago.users.lookup import record_change
+from misago.users.models import User
+from misago.users.uploads import delete_avatar_files
+
+"""
+Users pruning engine
+
+Users are selected by criteria on indexed columns and deleted in chunks. Instead of letting
+Django collect every related row of every user, related rows of whole chunk are deleted,
+or unlinked from users when their relation allows it, with one query per relation.
+"""
+def get_prune_queryset(registered_days=None, last_visit_days=None, inactive_only=False, no_posts=False):
+    """
+    Return queryset of users matching prune criteria
+    """
+    users = User.objects.exclude(roles__protected=True)
+    if registered_days:
+        users = users.filter(join_date__lt=timezone.now() - timedelta(days=registered_days))
+    if last_visit_days:
+        # Users that never visited forums are judged by their registration date
+        cutoff = timezone.now() - timedelta(days=last_visit_days)
+        users = users.filter(Q(last_date__lt=cutoff) | Q(last_date__isnull=True, join_date__lt=cutoff))
+    if inactive_only:
+        users = users.filter(activation__gt=User.ACTIVATION_NONE)
+    if no_posts:
+        users = users.filter(posts=0)
+    # Forums cant lose their last poster
+    from misago.forums.models import Forum
+    return users.exclude(pk__in=Forum.objects.values_list('last_poster', flat=True))
+
+
+def prune_users(users):
+    """
+    Delete chunk of users together with their related rows
+    """
+    users_ids = [user.pk for user in users]
+    for user in users:
+        if user.avatar_type == 'upload' and user.avatar_image:
+            delete_avatar_files(user.avatar_image)
+    
+    for related in User._meta.get_all_related_objects(include_hidden=True):
+        related_rows = related.model.objects.filter(**{'%s__in' % related.field.name: users_ids})
+        if related.field.null:
+            related_rows.update(**{related.field.name: None})
+        else:
+            related_rows.delete()
+    for field in User._meta.many_to_many:
+        field.rel.through.objects.filter(user__in=users_ids).delete()
+    User.objects.filter(pk__in=users_ids).delete()
+    transaction.commit_unless_managed()
+    
+    for user in users:
+        record_change(user.pk, old_slug=user.username_slug)
+
+
+def prune_finished():
+    """
+    Update forum stats after users have been pruned
+    """
+    User.objects.resync_monitor(Monitor())
+    invalidate_directory()
+
+
+def prune(queryset, chunk_size=100):
+    """
+    Prune all users from queryset, returning number of deleted users
+    """
+    deleted = 0
+    last_pk = 0
+    while True:
+        users = [user for user in queryset.filter(pk__gt=last_pk).order_by('pk')[:chunk_size]]
+        if not users:
+            break
+        last_pk = users[-1].pk
+        prune_users(users)
+        deleted += len(users)
+    prune_finished()
+    return deleted
\ No newline at end of file
@@ -0,0 +1,122 @@
+from django.db import connection, transaction
+from misago.users.directory import invalidate_directory
+from misago.users.models import User, Rank, SCORE_DECAY, get_score_epoch
+
+"""
+Users ranking engine
+
+Users are ordered by their decayed scores in database. Ranks are given to ranges of
+positions between their users limits, so for each limit only the user standing on it
+is read, and users in range whose rank differs are updated with single query.
+
+Decayed scores are computed by database from score and day it was last decayed on,
+and only scores of users close to ranks boundaries are saved, so ranking run doesnt
+rewrite whole users table.
+"""
+def get_ranking_ranks(users_total):
+    """
+    Return default rank and list of (users limit, rank) pairs for ranks that can be rolled in
+    """
+    default_rank = None
+    ranks = []
+    for rank in Rank.objects.filter(special=0).order_by('order'):
+        if not default_rank:
+            default_rank = rank
+        else:
+            limit = rank.get_users_limit(users_total)
+            if limit:
+                ranks.append((limit, rank))
+    return default_rank, ranks
+
+
+def get_position_rank(position, default_rank, ranks):
+    rank = default_rank
+    for limit, limit_rank in ranks:
+        if position < limit:
+            rank = limit_rank
+    return rank
+
+
+def update_in_chunks(users_ids, chunk_size, **fields):
+    """
+    Update users from list of ids chunk after chunk
+    """
+    for i in range(0, len(users_ids), chunk_size):
+        User.objects.filter(id__in=users_ids[i:i + chunk_size]).update(**fields)
+        transaction.commit_unless_managed()
+
+
+def get_decayed_score_sql(users, epoch):
+    """
+    Return SQL expression computing users decayed scores
+    """
+    qn = connection.ops.quote_name
+    score = '%s.%s' % (qn(User._meta.db_table), qn(User._meta.get_field('score').column))
+    factors = []
+    for score_epoch in users.exclude(score_epoch=0).filter(score_epoch__lt=epoch).values_list('score_epoch', flat=True).order_by().distinct():
+        factors.append('WHEN %s THEN %r' % (score_epoch, SCORE_DECAY ** (epoch - score_epoch)))
+    if not factors:
+        return score
+    return '(%s * CASE %s.%s %s ELSE 1 END)' % (score, qn(User._meta.db_table),
+                                                qn(User._meta.get_field('score_epoch').column), ' '.join(factors))
+
+
+def get_position_where(decayed_sql, position, ranking):
+    """
+    Return SQL condition and its params matching users ranked before position
+    """
+    decayed_score, user_id = ranking.values_list('decayed_score', 'id')[position]
+    condition = '(%(score)s > %%s OR (%(score)s = %%s AND %(id)s < %%s))' % {
+                     'score': decayed_sql,
+                     'id': '%s.%s' % (connection.ops.quote_name(User._meta.db_table), connection.ops.quote_name(User._meta.pk.column)),
+                     }
+    return condition, [decayed_score, decayed_score, user_id]
+
+
+def update_ranking(chunk_size=500, boundary_margin=50):
+    """
+    Update users ranks and return number of users whose rank has changed
+    """
+    special_ranks = [rank.pk for rank in Rank.objects.filter(special=1)]
+    users = User.objects.exclude(rank__in=special_ranks)
+    users_total = users.count()
+    default_rank, ranks = get_ranking_ranks(users_total)
+    if not default_rank:
+        return 0
+    
+    epoch = get_score_epoch()
+    decayed_sql = get_decayed_score_sql(users, epoch)
+    ranking = users.extra(select={'decayed_score': decayed_sql}, order_by=['-decayed_score', 'id'])
+    boundaries = sorted(set([limit for limit, rank in ranks if limit < users_total]))
+    
+    # Save decayed score of users that are about to move between ranks
+    decays = {}
+    for boundary in boundaries:
+        for user_id, decayed_score, score_epoch in ranking.values_list('id', 'decayed_score', 'score_epoch')[max(boundary - boundary_margin, 0):boundary + boundary_margin + 1]:
+            if score_epoch != epoch:
+                decays.setdefault(int(decayed_score), set()).add(user_id)
+    
+    # Update ranks of users in each range of positions between boundaries
+    changed = 0
+    conditions = dict([(boundary, get_position_where(decayed_sql, boundary, ranking)) for boundary in boundaries])
+    ranges = [0] + boundaries + [users_total]
+    for i in range(0, len(ranges) - 1):
+        range_users = users
+        if ranges[i] in conditions:
+            condition, params = conditions[ranges[i]]
+            range_users = range_users.extra(where=['NOT %s' % condition], params=params)
+        if ranges[i + 1] in conditions:
+            condition, params = conditions[ranges[i + 1]]
+            range_users = range_users.extra(where=[condition], params=params)
+        rank = get_position_rank(ranges[i], default_rank, ranks)
+        changed += range_users.exclude(rank=rank).update(rank=rank)
+        transaction.commit_unless_managed()
+    
+    for score, users_ids in decays.items():
+        update_in_chunks(list(users_ids), chunk_size, score=score, score_epoch=epoch)
+    # Users that never had their score decayed start decaying from now on
+    users.filter(score_epoch=0).update(score_epoch=epoch)
+    
+    if changed:
+        invalidate_directory()
+    return changed
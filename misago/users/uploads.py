@@ -0,0 +1,127 @@
+import os
+import threading
+from multiprocessing.pool import ThreadPool
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.utils.translation import ugettext_lazy as _
+from path import path
+from misago.security import get_random_string
+from misago.users.avatars import AVATAR_SIZES
+use_pil = True
+try:
+    from PIL import Image
+except ImportError:
+    use_pil = False
+
+"""
+Uploaded avatars pipeline
+
+Uploaded image is validated by decoding it from uploaded file, then it's saved on disk
+and resized to all avatar sizes by pool of worker threads. Each size is written to
+temporary file first and then renamed, so incomplete avatars are never served.
+"""
+_pool = {}
+_pool_lock = threading.Lock()
+
+
+def get_pool():
+    with _pool_lock:
+        if not 'pool' in _pool:
+            _pool['pool'] = ThreadPool(settings.AVATAR_UPLOAD_WORKERS)
+    return _pool['pool']
+
+
+def get_avatars_dir():
+    return path(settings.MEDIA_ROOT).joinpath('avatars')
+
+
+def get_avatar_filename(image, size):
+    return '%s_%s.png' % (image, size)
+
+
+def validate_avatar(upload):
+    """
+    Check if uploaded file is image we can use as avatar
+    """
+    if not use_pil:
+        raise ValidationError(_("Avatars uploads are not available."))
+    if upload.size > settings.AVATAR_UPLOAD_LIMIT * 1024:
+        raise ValidationError(_("Avatar image cannot be bigger than %(limit)s KB.") % {'limit': settings.AVATAR_UPLOAD_LIMIT})
+    try:
+        image = Image.open(upload)
+        image.verify()
+    except Exception:
+        raise ValidationError(_("Uploaded file is not correct image."))
+    finally:
+        upload.seek(0)
+    if not image.format in ('GIF', 'JPEG', 'PNG'):
+        raise ValidationError(_("Avatar image has to be GIF, JPEG or PNG file."))
+    if max(image.size) > settings.AVATAR_UPLOAD_DIMENSIONS:
+        raise ValidationError(_("Avatar image cannot be bigger than %(size)s pixels.") % {'size': settings.AVATAR_UPLOAD_DIMENSIONS})
+
+
+def resize_avatar(source, target, size):
+    """
+    Cut square from middle of image and save it scaled to size
+    """
+    image = Image.open(source)
+    if image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    width, height = image.size
+    side = min(width, height)
+    image = image.crop(((width - side) // 2, (height - side) // 2, (width + side) // 2, (height + side) // 2))
+    image = image.resize((size, size), Image.ANTIALIAS)
+    temp = target.parent.joinpath('.%s' % target.name)
+    image.save(temp, 'PNG')
+    os.rename(temp, target)
+
+
+def process_avatar(user, upload):
+    """
+    Make avatar from uploaded image, set it as user's avatar and save user
+    """
+    validate_avatar(upload)
+    avatars_dir = get_avatars_dir()
+    if not avatars_dir.exists():
+        avatars_dir.makedirs()
+    
+    image = '%s_%s' % (user.pk, get_random_string(8))
+    source = avatars_dir.joinpath('.%s_source' % image)
+    try:
+        with open(source, 'wb') as source_file:
+            for chunk in upload.chunks():
+                source_file.write(chunk)
+        results = []
+        for size_name, size in AVATAR_SIZES.items():
+            results.append(get_pool().apply_async(resize_avatar, (source, avatars_dir.joinpath(get_avatar_filename(image, size_name)), size)))
+        for result in results:
+            result.get(timeout=60)
+    except Exception:
+        delete_avatar_files(image)
+        raise
+    finally:
+        if source.exists():
+            source.remove()
+    
+    old_image = user.avatar_image if user.avatar_type == 'upload' else None
+    user.avatar_type = 'upload'
+    user.avatar_image = image
+    user.update_version()
+    try:
+        user.save(force_update=True)
+    except Exception:
+        delete_avatar_files(image)
+        raise
+    
+    # Old avatar is deleted only after user points to new one
+    if old_image:
+        delete_avatar_files(old_image)
+    from misago.users.directory import invalidate_directory
+    invalidate_directory()
+
+
+def delete_avatar_files(image):
+    for size_name in AVATAR_SIZES.keys():
+        avatar = get_avatars_dir().joinpath(get_avatar_filename(image, size_name))
+        if avatar.exists():
+            avatar.remove()
\ No newline at end of file
@@ -7,6 +7,7 @@ urlpatterns = patterns('misago.users.views',
     url(r'^reset-pass/$', 'password.form', name="forgot_password"),
     url(r'^reset-pass/(?P<username>[a-z0-9]+)-(?P<user>\d+)/(?P<token>[a-z0-9]+)/$', 'password.reset', name="reset_password"),
     url(r'^users/$', 'profiles.list', name="users"),
+    url(r'^avatars/gravatar/(?P<email_hash>[0-9a-f]{32})-(?P<size>[a-z]+)\.png$', 'avatars.gravatar', name="gravatar"),
     url(r'^users/(?P<username>\w+)-(?P<user>\d+)/$', 'profiles.show', name="user"),
     url(r'^users/(?P<rank_slug>(\w|-)+)/$', 'profiles.list', name="users"),
     url(r'^usercp/$', 'usercp.options', name="usercp"),
@@ -0,0 +1,36 @@
+from django.shortcuts import redirect
+from django.utils import timezone
+from misago.users.avatars import AVATAR_SIZES
+from misago.users.directory import invalidate_directory
+from misago.users.gravatar import delete_gravatar, get_gravatar_url, is_gravatar_fresh, store_gravatar
+from misago.users.models import User
+from misago.views import error404
+
+
+def gravatar(request, email_hash, size):
+    if not size in AVATAR_SIZES:
+        return error404(request)
+    try:
+        user = User.objects.get(email_hash=email_hash)
+    except User.DoesNotExist:
+        return error404(request)
+    
+    if not user.gravatar_image or not is_gravatar_fresh(user.gravatar_date):
+        try:
+            image = store_gravatar(email_hash)
+        except IOError:
+            if not user.gravatar_image:
+                # Gravatar is not available, let browser try its luck
+                return redirect('https://secure.gravatar.com/avatar/%s?s=%s' % (email_hash, AVATAR_SIZES[size]))
+            # Keep old gravatar until next refresh
+            image = user.gravatar_image
+        if image == user.gravatar_image:
+            User.objects.filter(pk=user.pk).update(gravatar_date=timezone.now())
+        else:
+            # Pages showing old gravatar have to be rendered again before its files are deleted
+            User.objects.filter(pk=user.pk).update(gravatar_image=image, gravatar_date=timezone.now(), profile_date=timezone.now())
+            invalidate_directory()
+            if user.gravatar_image:
+                delete_gravatar(user.gravatar_image)
+            user.gravatar_image = image
+    return redirect(get_gravatar_url(user.gravatar_image, size))
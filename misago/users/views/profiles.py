@@ -1,9 +1,16 @@
+import hashlib
+from django.core.cache import cache
 from django.core.urlresolvers import reverse
+from django.http import HttpResponseNotModified
 from django.shortcuts import redirect
 from django.template import RequestContext
+from django.utils import translation
+from django.utils.http import http_date, parse_http_date_safe
 from misago.forms import FormFields
 from misago.messages import Message
+from misago.users.directory import render_page
 from misago.users.forms import QuickFindUserForm
+from misago.users.lookup import find_users
 from misago.users.models import User, Rank
 from misago.views import error404
 from misago.utils import slugify
@@ -26,6 +33,8 @@ def list(request, rank_slug=None):
     # Empty Defaults
     message = None
     users = []
+    page = None
+    page_url = None
     in_search = False
     
     # Users search?
@@ -37,24 +46,13 @@ def list(request, rank_slug=None):
             # Direct hit?
             username = search_form.cleaned_data['username']
             try:
-                user = User.objects.get(username__iexact=username)
+                user = User.objects.get(username_slug=slugify(username))
                 return redirect(reverse('user', args=(user.username_slug, user.pk)))
             except User.DoesNotExist:
                 pass
             
             # Looks like well have to find near match
-            if len(username) > 6:
-                username = username[0:-3]
-            elif len(username) > 5:
-                username = username[0:-2]
-            elif len(username) > 4:
-                username = username[0:-1]
-            username = slugify(username.strip())
-            
-            # Go for rought match
-            if len(username) > 0:
-                print username
-                users = User.objects.filter(username_slug__startswith=username).order_by('username_slug')[:10]
+            users = find_users(username)
         elif search_form.non_field_errors()[0] == 'form_contains_errors':
             message = Message(request, 'users/search_empty', 'error')
         else:
@@ -62,7 +60,11 @@ def list(request, rank_slug=None):
     else:
         search_form = QuickFindUserForm(request=request)
         if active_rank:
-            users = User.objects.filter(rank=active_rank).order_by('username_slug')
+            page = render_page(request, active_rank, request.GET.get('after'), request.GET.get('before'))
+            if active_rank.pk == ranks[0].pk:
+                page_url = reverse('users')
+            else:
+                page_url = reverse('users', kwargs={'rank_slug': active_rank.name_slug})
     
     return request.theme.render_to_response('users/list.html',
                                         {
@@ -72,10 +74,22 @@ def list(request, rank_slug=None):
                                          'active_rank': active_rank,
                                          'ranks': ranks,
                                          'users': users,
+                                         'page': page,
+                                         'page_url': page_url,
                                         },
                                         context_instance=RequestContext(request));
 
 
+def is_not_modified(request, etag, last_modified):
+    """
+    Tell if page cached by client is still valid, ETag takes precedence over date
+    """
+    if request.META.get('HTTP_IF_NONE_MATCH'):
+        return request.META['HTTP_IF_NONE_MATCH'] == etag
+    modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+    return modified_since is not None and modified_since >= last_modified
+
+
 def show(request, user, username):
     user = int(user)
     try:
@@ -83,10 +97,38 @@ def show(request, user, username):
         if user.username_slug != username:
             # Force crawlers to take notice of updated username
             return redirect(reverse('user', args=(user.username_slug, user.pk)), permanent=True)
-        return request.theme.render_to_response('users/profile.html',
+        
+        version = user.get_version()
+        profile_key = '%s.%s.%s.%s' % (user.pk, version, request.theme.get_theme(), translation.get_language())
+        
+        # Signed in users see their own data and CSRF token on page, so their tag is valid only
+        # within their session. Guests and crawlers see same page, that changes with profile only.
+        if request.user.is_authenticated():
+            viewer_key = '%s.%s.%s' % (request.user.pk, request.user.get_version(), request.csrf.csrf_token)
+            last_modified = max(version, request.user.get_version()) // 1000
+        else:
+            viewer_key = 'crawler' if request.user.is_crawler() else 'guest'
+            last_modified = version // 1000
+        etag = '"%s"' % hashlib.md5('%s.%s' % (profile_key, viewer_key)).hexdigest()
+        if not request.messages.messages and is_not_modified(request, etag, last_modified):
+            response = HttpResponseNotModified()
+            response['ETag'] = etag
+            response['Last-Modified'] = http_date(last_modified)
+            return response
+        
+        profile_html = cache.get('misago.users.profile.%s' % profile_key)
+        if profile_html is None:
+            profile_html = request.theme.render_to_string('users/profile_content.html', {'profile': user})
+            cache.set('misago.users.profile.%s' % profile_key, profile_html, 86400)
+        
+        response = request.theme.render_to_response('users/profile.html',
                                             {
                                              'profile': user,
+                                             'profile_html': profile_html,
                                             },
                                             context_instance=RequestContext(request));
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return response
     except User.DoesNotExist:
         return error404(request)
\ No newline at end of file
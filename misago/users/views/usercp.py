@@ -1,7 +1,12 @@
 from django.core.urlresolvers import reverse
 from django.shortcuts import redirect
 from django.template import RequestContext
+from django.utils.translation import ugettext as _
+from misago.forms.layouts import FormLayout
+from misago.messages import Message
 from misago.security.decorators import *
+from misago.users.forms import UploadAvatarForm
+from misago.users.uploads import process_avatar
 
 
 @block_guest   
@@ -33,9 +38,24 @@ def username(request):
  
 @block_guest
 def avatar(request):
+    message = None
+    if request.method == 'POST':
+        form = UploadAvatarForm(request.POST, files=request.FILES, request=request)
+        if form.is_valid():
+            process_avatar(request.user, form.cleaned_data['avatar'])
+            request.messages.set_flash(Message(request, _("Your avatar has been changed.")), 'success')
+            return redirect(reverse('usercp_avatar'))
+        elif 'avatar' in form.errors:
+            message = Message(request, form.errors['avatar'][0])
+        else:
+            message = Message(request, form.non_field_errors()[0])
+    else:
+        form = UploadAvatarForm(request=request)
     return request.theme.render_to_response('users/usercp/avatar.html',
                                             {
                                              'tab': 'avatar',
+                                             'message': message,
+                                             'form': FormLayout(form),
                                              },
                                             context_instance=RequestContext(request));
     
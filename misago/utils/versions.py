@@ -0,0 +1,31 @@
+"""
+Cache versions
+
+Version is number stored in cache under key, changed to make all cache entries built
+with its old value stale. New versions start from current time, so entries cached
+before version was lost from cache are not reused.
+"""
+import time
+from django.core.cache import cache
+
+def get_version(key):
+    """
+    Return version stored under key, or None if cache cant keep it
+    """
+    version = cache.get(key)
+    if version is None:
+        cache.set(key, int(time.time()))
+        version = cache.get(key)
+    return version
+
+
+def bump_version(key):
+    """
+    Change version stored under key and return its new value
+    """
+    try:
+        return cache.incr(key)
+    except ValueError:
+        version = int(time.time())
+        cache.set(key, version)
+        return version
\ No newline at end of file
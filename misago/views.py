@@ -1,8 +1,16 @@
+import time
 from django.template import RequestContext
+from django.utils.http import http_date
+from django.views.static import serve
+from misago.forums.tree import get_forum_tree
 
-def home(request):    
+def home(request):
+    forums_tree = get_forum_tree()
     return request.theme.render_to_response('index.html',
-                                            {'page_title': 'Hello World!'},
+                                            {
+                                             'forums_tree': forums_tree,
+                                             'categories': forums_tree.get_roots(),
+                                             },
                                             context_instance=RequestContext(request));
 
 def error403(request, message=None, title=None):
@@ -11,6 +19,16 @@ def error403(request, message=None, title=None):
 def error404(request, message=None, title=None):
     return error_view(request, 404, message, title)
 
+def serve_media(request, path, document_root):
+    """
+    Serve media in DEBUG, letting browsers cache stored gravatars for good
+    """
+    response = serve(request, path, document_root)
+    if path.startswith('avatars/gravatar/') and response.status_code == 200:
+        response['Cache-Control'] = 'public, max-age=31536000'
+        response['Expires'] = http_date(time.time() + 31536000)
+    return response
+
 def error_view(request, error, message, title):
     if message:
         message.single = True